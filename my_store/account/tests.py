@@ -1,3 +1,39 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from products.models import Product
+from sales.models import Sale
+from .models import User
+
+
+class DashboardStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+
+    def test_stats_built_from_grouped_queries(self):
+        Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=3)
+        Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=50, is_active=False)
+        Sale.objects.create(total_amount=Decimal('1500.00'))
+        old_sale = Sale.objects.create(total_amount=Decimal('700.00'))
+        Sale.objects.filter(pk=old_sale.pk).update(sale_date=timezone.now() - timedelta(days=62))
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        # Lecture des versions partagées puis les requêtes groupées
+        cache.clear()
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/dashboard/stats/')
+
+        self.assertEqual(response.data['products'], {'total': 2, 'active': 1, 'low_stock': 1})
+        self.assertEqual(response.data['sales'], {'total': 2, 'recent': 1})
+        self.assertEqual(response.data['revenue']['total'], 2200.0)
+        monthly = response.data['monthly_revenue']
+        self.assertEqual(len(monthly), 12)
+        self.assertEqual(monthly[-1], 1500.0)
+        self.assertEqual(sum(monthly), 2200.0)
@@ -1,7 +1,7 @@
 from django.contrib.auth import authenticate
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
@@ -66,95 +66,99 @@ class DashboardStatsView(APIView):
     """Return dashboard statistics."""
 
     permission_classes = [IsAuthenticated]
+    # Modèles lus par les statistiques : toute écriture sur l'un d'eux invalide le cache
+    cache_models = (
+        'products.Product', 'customers.Customer', 'sales.DailySalesSummary', 'expenses.DailyExpenseSummary',
+    )
 
     def get(self, request):
+        from core.cache import cached_response
+
+        # Les compteurs « 30 derniers jours » dépendent de la date : cache court et clé datée
+        return cached_response(
+            request, self.cache_models, self.build_stats,
+            timeout=60, extra=timezone.localdate().isoformat()
+        )
+
+    def build_stats(self):
         try:
             from products.models import Product
-            from sales.models import Sale
-            from expenses.models import Expense
+            from sales.models import DailySalesSummary
+            from expenses.models import DailyExpenseSummary
             from customers.models import Customer
-            from django.db.models import Sum, Q
-            from datetime import timedelta
-
-            # Total products
-            total_products = Product.objects.count()
-            active_products = Product.objects.filter(is_active=True).count()
+            from django.db.models.functions import TruncMonth
 
-            # Total sales
-            total_sales = Sale.objects.count()
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            recent_sales = Sale.objects.filter(sale_date__gte=thirty_days_ago).count()
-
-            # Total expenses
-            total_expenses = Expense.objects.count()
-            recent_expenses = Expense.objects.filter(expense_date__gte=thirty_days_ago.date()).count()
-
-            # Total customers
-            total_customers = Customer.objects.count()
-            recent_customers = Customer.objects.filter(created_at__gte=thirty_days_ago).count()
-
-            # Revenue from sales
-            total_revenue = Sale.objects.aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
+            now = timezone.now()
+            thirty_days_ago = now - timedelta(days=30)
+
+            # Une requête d'agrégats conditionnels par modèle ; ventes et dépenses
+            # sont lues dans les cumuls journaliers plutôt que dans les tables brutes
+            products = Product.objects.aggregate(
+                total=Count('id'),
+                active=Count('id', filter=Q(is_active=True)),
+                low_stock=Count('id', filter=Q(stock__lt=10, is_active=True)),
+            )
+            recent_day = timezone.localdate(thirty_days_ago)
+            sales = DailySalesSummary.objects.aggregate(
+                total=Sum('sale_count'),
+                recent=Sum('sale_count', filter=Q(day__gte=recent_day)),
+                revenue=Sum('revenue'),
+            )
+            expenses = DailyExpenseSummary.objects.aggregate(
+                total=Sum('expense_count'),
+                recent=Sum('expense_count', filter=Q(day__gte=recent_day)),
+                amount=Sum('amount'),
+            )
+            customers = Customer.objects.aggregate(
+                total=Count('id'),
+                recent=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+            )
 
-            # Total expenses
-            total_expenses_amount = Expense.objects.aggregate(
-                total=Sum('amount')
-            )['total'] or 0
+            total_revenue = sales['revenue'] or 0
+            total_expenses_amount = expenses['amount'] or 0
 
             # Net revenue (sales - expenses)
             net_revenue = float(total_revenue) - float(total_expenses_amount)
 
-            # Low stock products
-            low_stock_products = Product.objects.filter(stock__lt=10, is_active=True).count()
-
-            # Monthly revenue for the last 12 months
-            monthly_revenue = []
-            now = timezone.now()
-            from calendar import monthrange
-            from datetime import datetime as dt
-            
-            for i in range(11, -1, -1):
-                # Calculer le mois (i mois en arrière)
-                target_date = now - timedelta(days=30*i)
-                year = target_date.year
-                month = target_date.month
-                
-                # Premier jour du mois
-                month_start = timezone.make_aware(dt(year, month, 1, 0, 0, 0))
-                # Dernier jour du mois
-                last_day = monthrange(year, month)[1]
-                month_end = timezone.make_aware(dt(year, month, last_day, 23, 59, 59))
-                
-                try:
-                    month_sales = Sale.objects.filter(
-                        sale_date__gte=month_start,
-                        sale_date__lte=month_end
-                    ).aggregate(total=Sum('total_amount'))['total'] or 0
-                    monthly_revenue.append(float(month_sales))
-                except Exception as e:
-                    # En cas d'erreur, ajouter 0
-                    monthly_revenue.append(0.0)
+            # Chiffre d'affaires des 12 derniers mois calendaires, en une requête GROUP BY mois
+            months = []
+            local_now = timezone.localtime(now)
+            year, month = local_now.year, local_now.month
+            for _ in range(12):
+                months.append((year, month))
+                year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+            months.reverse()
+            first_year, first_month = months[0]
+            period_start = datetime(first_year, first_month, 1).date()
+
+            revenue_by_month = {
+                (row['month'].year, row['month'].month): row['total'] or 0
+                for row in DailySalesSummary.objects.filter(day__gte=period_start)
+                .annotate(month=TruncMonth('day'))
+                .order_by()
+                .values('month')
+                .annotate(total=Sum('revenue'))
+            }
+            monthly_revenue = [float(revenue_by_month.get(key, 0)) for key in months]
 
             return Response({
                 'products': {
-                    'total': total_products,
-                    'active': active_products,
-                    'low_stock': low_stock_products,
+                    'total': products['total'],
+                    'active': products['active'],
+                    'low_stock': products['low_stock'],
                 },
                 'sales': {
-                    'total': total_sales,
-                    'recent': recent_sales,
+                    'total': sales['total'] or 0,
+                    'recent': sales['recent'] or 0,
                 },
                 'expenses': {
-                    'total': total_expenses,
-                    'recent': recent_expenses,
+                    'total': expenses['total'] or 0,
+                    'recent': expenses['recent'] or 0,
                     'amount': float(total_expenses_amount),
                 },
                 'customers': {
-                    'total': total_customers,
-                    'recent': recent_customers,
+                    'total': customers['total'],
+                    'recent': customers['recent'],
                 },
                 'revenue': {
                     'total': float(total_revenue),
@@ -0,0 +1,30 @@
+from django.contrib import admin
+from .models import DocumentCounter, IdempotencyKey, Job, ModelVersion
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'path', 'response_status', 'created_at']
+    list_filter = ['path', 'created_at']
+    search_fields = ['key']
+    readonly_fields = ['created_at']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'progress', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(DocumentCounter)
+class DocumentCounterAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'year', 'last_value']
+    list_filter = ['prefix', 'year']
+    readonly_fields = ['prefix', 'year', 'last_value']
+
+
+@admin.register(ModelVersion)
+class ModelVersionAdmin(admin.ModelAdmin):
+    list_display = ['label', 'value']
+    readonly_fields = ['label', 'value']
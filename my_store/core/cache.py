@@ -0,0 +1,131 @@
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+RESPONSE_PREFIX = 'response'
+STATS_KEYS = {'hits': 'response-cache:hits', 'misses': 'response-cache:misses'}
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def model_versions(models):
+    """
+    Versions courantes des modèles, lues en une requête dans la table ModelVersion,
+    partagée par tous les processus (les réponses, elles, restent dans le cache local).
+    Un modèle jamais modifié a la version 0.
+    """
+    from .models import ModelVersion
+
+    labels = [_label(model).lower() for model in models]
+    versions = dict(ModelVersion.objects.filter(label__in=labels).values_list('label', 'value'))
+    return [versions.get(label, 0) for label in labels]
+
+
+def _bump(labels):
+    """
+    Incrémente les versions en une seule requête atomique (insertion du compteur ou
+    incrément côté base) : deux processus ne perdent jamais d'incrément et une version
+    ne revient jamais en arrière. Un nouveau compteur part de l'horodatage en
+    millisecondes, pour ne pas retomber sur une version déjà vue (base réinitialisée).
+    """
+    from .models import ModelVersion
+
+    table = connection.ops.quote_name(ModelVersion._meta.db_table)
+    start = int(time.time() * 1000)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (label, value) VALUES {', '.join(['(%s, %s)'] * len(labels))} "
+            f"ON CONFLICT (label) DO UPDATE SET value = {table}.value + 1",
+            [param for label in labels for param in (label, start)],
+        )
+
+
+def bump_model_version(*models):
+    """
+    Invalide les réponses en cache qui dépendent de ces modèles. Appelé par les signaux
+    et par les écritures groupées (update(), bulk_create, SQL brut) qui ne les déclenchent pas.
+    La version est incrémentée après le commit : une lecture concurrente qui aurait mis
+    en cache l'état d'avant la transaction l'a fait sous l'ancienne version.
+    """
+    labels = sorted({_label(model).lower() for model in models})
+    transaction.on_commit(lambda: _bump(labels))
+
+
+def _on_write(sender, **kwargs):
+    bump_model_version(sender)
+
+
+def connect_signals():
+    for label in getattr(settings, 'RESPONSE_CACHE_MODELS', ()):
+        model = apps.get_model(label)
+        post_save.connect(_on_write, sender=model, dispatch_uid=f'response-cache-save:{label}')
+        post_delete.connect(_on_write, sender=model, dispatch_uid=f'response-cache-delete:{label}')
+
+
+def _count(name):
+    try:
+        cache.incr(STATS_KEYS[name])
+    except ValueError:
+        cache.add(STATS_KEYS[name], 0, timeout=None)
+        cache.incr(STATS_KEYS[name])
+
+
+def cache_stats():
+    values = cache.get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS['hits'], 0)
+    misses = values.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 4) if total else None}
+
+
+def response_cache_key(request, models, extra=''):
+    """Clé construite à partir du chemin, des paramètres, du format et des versions des modèles"""
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.lists()))
+    renderer = getattr(request, 'accepted_renderer', None)
+    versions = ','.join(str(version) for version in model_versions(models))
+    raw = f'{request.path}?{params}|{renderer.format if renderer else ""}|{extra}|{versions}'
+    return f'{RESPONSE_PREFIX}:{hashlib.sha256(raw.encode("utf-8")).hexdigest()}'
+
+
+def cached_response(request, models, handler, timeout=DEFAULT_TIMEOUT, extra=''):
+    """
+    Renvoie la réponse en cache pour cette requête, ou exécute `handler` et met
+    en cache ses données si elle réussit. L'en-tête X-Cache indique HIT ou MISS.
+    """
+    key = response_cache_key(request, models, extra)
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _count('misses')
+    response = handler()
+    if response.status_code == 200 and isinstance(response, Response):
+        cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedListMixin:
+    """
+    Met en cache la réponse de `list` ; `cache_models` liste les modèles dont
+    dépend la liste (le modèle principal et ceux lus via les serializers).
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_models or (self.queryset.model,),
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs)
+        )
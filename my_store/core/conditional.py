@@ -0,0 +1,70 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import model_versions
+
+
+def _has_field(model, name):
+    return any(field.name == name for field in model._meta.concrete_fields)
+
+
+class ConditionalGetMixin:
+    """
+    GET conditionnel (ETag / If-None-Match) pour `list` et `retrieve`.
+
+    L'ETag est calculé avant toute sérialisation à partir d'une seule petite requête
+    (MAX(updated_at) et nombre de lignes du queryset filtré) et des versions de cache
+    des modèles listés dans `etag_models` (modèles liés affichés par les serializers,
+    ou modèles sans `updated_at`). Si le client possède déjà cette version, la réponse
+    est un 304 sans contenu.
+    """
+    etag_models = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+    def conditional_response(self, request, queryset, handler):
+        etag, last_modified = self._validators(request, queryset)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        # Le navigateur garde la réponse mais la revalide à chaque navigation
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _validators(self, request, queryset):
+        model = queryset.model
+        if _has_field(model, 'updated_at'):
+            state = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('pk'))
+        else:
+            state = {'last': None, **queryset.order_by().aggregate(count=Count('pk'))}
+        versions = model_versions(self.etag_models) if self.etag_models else []
+        params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.lists()))
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw = (
+            f'{request.path}?{params}|{renderer.format if renderer else ""}|'
+            f'{state["last"].isoformat() if state["last"] else ""}|{state["count"]}|'
+            f'{",".join(str(version) for version in versions)}'
+        )
+        return quote_etag(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]), state['last']
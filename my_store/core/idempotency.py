@@ -0,0 +1,86 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Durée pendant laquelle une clé rejoue la réponse enregistrée
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+
+def _request_hash(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotentCreateMixin:
+    """
+    Rend `create` idempotent lorsque le client envoie un en-tête Idempotency-Key :
+    une requête rejouée renvoie la réponse enregistrée sans relancer le serializer
+    ni les écritures (stock, numéros...).
+    """
+
+    def create(self, request, *args, **kwargs):
+        return self.run_idempotent(request, lambda: super(IdempotentCreateMixin, self).create(request, *args, **kwargs))
+
+    def run_idempotent(self, request, handler):
+        """
+        Exécute `handler` une seule fois par clé. La clé est propre à l'utilisateur :
+        sans utilisateur authentifié (pas de valeur non nulle pour la contrainte unique),
+        l'en-tête est ignoré.
+        """
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler()
+
+        request_hash = _request_hash(request)
+        lookup = {'key': key[:255], 'user': request.user, 'path': request.path[:255]}
+
+        with transaction.atomic():
+            IdempotencyKey.objects.filter(
+                created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL, **lookup
+            ).delete()
+            try:
+                # Savepoint propre à la réservation de la clé : seule une violation de la
+                # contrainte unique (requête concurrente avec la même clé) est interceptée,
+                # les erreurs du handler remontent telles quelles
+                with transaction.atomic():
+                    record, created = IdempotencyKey.objects.get_or_create(
+                        **lookup, defaults={'request_hash': request_hash}
+                    )
+            except IntegrityError:
+                record, created = IdempotencyKey.objects.get(**lookup), False
+            if created:
+                response = handler()
+                if response.status_code < 500:
+                    record.response_status = response.status_code
+                    record.response_body = response.data
+                    record.save(update_fields=['response_status', 'response_body'])
+                else:
+                    # Erreur serveur : libérer la clé pour permettre une nouvelle tentative
+                    record.delete()
+                return response
+
+        if record.request_hash != request_hash:
+            return Response(
+                {'error': "Cette clé d'idempotence a déjà été utilisée avec une autre requête."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if record.response_status is None:
+            return Response(
+                {'error': 'Une requête avec cette clé est déjà en cours de traitement.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return _replay(record)
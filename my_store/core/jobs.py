@@ -0,0 +1,166 @@
+import logging
+import os
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Rapports : type de job -> fonction construisant le Report à partir des paramètres
+REPORT_JOBS = {
+    'sales_report': 'sales.reports.sales_report',
+    'expenses_report': 'expenses.reports.expenses_report',
+    'invoices_report': 'invoices.reports.invoices_report',
+    'orders_report': 'orders.reports.orders_report',
+}
+
+# Autres traitements : type de job -> fonction handler(job, context) retournant le résultat
+TASK_JOBS = {
+    'product_import': 'products.importer.run_import_job',
+    'invoice_pdf': 'invoices.views.run_invoice_pdf_job',
+    'invoice_pdf_bulk': 'invoices.bulk.run_bulk_pdf_job',
+}
+
+JOB_KINDS = (*REPORT_JOBS, *TASK_JOBS)
+
+# Un job resté « en cours » plus longtemps est considéré comme abandonné (worker arrêté)
+STALE_AFTER = timedelta(hours=1)
+
+# Jobs terminés (et leurs fichiers) conservés pendant cette durée, voir purge_finished_jobs
+JOB_RETENTION = timedelta(days=7)
+
+RESULT_DIR = 'jobs'
+UPLOAD_DIR = 'jobs/uploads'
+
+
+def _private_dir(base):
+    """
+    Dossier au nom aléatoire sous MEDIA_ROOT : les fichiers des jobs ne sont téléchargés
+    que par `/api/jobs/<id>/download/` (réservé au créateur), leur chemin ne se devine pas
+    """
+    return f'{base}/{secrets.token_hex(16)}'
+
+
+def enqueue_job(kind, params=None, user=None):
+    return Job.objects.create(kind=kind, params=params or {}, created_by=user)
+
+
+def save_upload(uploaded_file):
+    """Enregistre un fichier envoyé avec la demande de job ; retourne son chemin dans MEDIA_ROOT"""
+    return default_storage.save(f'{_private_dir(UPLOAD_DIR)}/{os.path.basename(uploaded_file.name)}', uploaded_file)
+
+
+def delete_job_file(name):
+    """Supprime un fichier de job et son dossier s'il est vide"""
+    if not name:
+        return
+    default_storage.delete(name)
+    try:
+        os.rmdir(os.path.dirname(default_storage.path(name)))
+    except OSError:
+        pass
+
+
+def claim_next_job():
+    """
+    Réserve le plus ancien job en attente : la mise à jour conditionnelle sur le statut
+    garantit qu'un job n'est pris que par un seul worker. Retourne son id ou None.
+    """
+    while True:
+        job_id = (
+            Job.objects.filter(status='pending')
+            .order_by('created_at', 'id').values_list('id', flat=True).first()
+        )
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now(), progress=0
+        )
+        if claimed:
+            return job_id
+
+
+def requeue_stale_jobs():
+    """Remet en attente les jobs « en cours » abandonnés par un worker arrêté"""
+    return Job.objects.filter(status='running', started_at__lt=timezone.now() - STALE_AFTER).update(
+        status='pending', started_at=None, progress=0
+    )
+
+
+def purge_finished_jobs(older_than=JOB_RETENTION):
+    """
+    Supprime les jobs terminés depuis plus de `older_than`, avec leur fichier résultat
+    et le fichier envoyé s'il reste. Retourne le nombre de jobs supprimés.
+    """
+    jobs = Job.objects.filter(status__in=('succeeded', 'failed'), finished_at__lt=timezone.now() - older_than)
+    for result_file, params in jobs.values_list('result_file', 'params').iterator():
+        delete_job_file(result_file)
+        if isinstance(params, dict):
+            delete_job_file(params.get('upload'))
+    deleted, _ = jobs.delete()
+    return deleted
+
+
+class JobContext:
+    """Accès du handler à la progression et au fichier résultat du job"""
+
+    def __init__(self, job):
+        self.job = job
+        self.result_name = ''
+        self._progress = 0
+
+    def set_progress(self, percent):
+        percent = max(0, min(int(percent), 99))
+        if percent != self._progress:
+            self._progress = percent
+            Job.objects.filter(pk=self.job.pk).update(progress=percent)
+
+    def open_result(self, filename):
+        """Ouvre en écriture le fichier résultat du job, dans un dossier privé sous MEDIA_ROOT/jobs/"""
+        self.result_name = f'{_private_dir(RESULT_DIR)}/{filename}'
+        path = os.path.join(settings.MEDIA_ROOT, self.result_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'wb')
+
+    def discard_result(self):
+        delete_job_file(self.result_name)
+        self.result_name = ''
+
+
+def run_report_job(job, context):
+    report = import_string(REPORT_JOBS[job.kind])(job.params)
+    file_format = 'csv' if job.params.get('format') == 'csv' else 'xlsx'
+    with context.open_result(f'{report.filename}.{file_format}') as handle:
+        report.save(handle, file_format)
+    return {'rows': report.row_count}
+
+
+def run_job(job_id):
+    """
+    Exécute un job réservé par claim_next_job (dans un processus du pool de `run_worker`)
+    et enregistre son résultat ou son erreur.
+    """
+    job = Job.objects.get(pk=job_id)
+    context = JobContext(job)
+    try:
+        if job.kind in REPORT_JOBS:
+            result = run_report_job(job, context)
+        else:
+            result = import_string(TASK_JOBS[job.kind])(job, context)
+    except Exception as e:
+        logger.exception("Échec du job %s", job_id)
+        context.discard_result()
+        Job.objects.filter(pk=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+        return 'failed'
+
+    Job.objects.filter(pk=job_id).update(
+        status='succeeded', progress=100, result=result,
+        result_file=context.result_name, finished_at=timezone.now()
+    )
+    return 'succeeded'
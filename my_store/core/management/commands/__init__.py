@@ -0,0 +1,2 @@
+# Management commands
+
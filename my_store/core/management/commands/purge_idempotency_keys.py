@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.idempotency import IDEMPOTENCY_KEY_TTL
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence expirées"
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ {deleted} clé(s) expirée(s) supprimée(s).'))
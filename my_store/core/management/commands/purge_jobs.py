@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from core.jobs import JOB_RETENTION, purge_finished_jobs
+
+
+class Command(BaseCommand):
+    help = "Supprime les jobs terminés anciens avec leurs fichiers (résultats et fichiers envoyés)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=JOB_RETENTION.days,
+                            help="Âge minimal en jours des jobs à supprimer")
+
+    def handle(self, *args, **options):
+        deleted = purge_finished_jobs(timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'✓ {deleted} job(s) supprimé(s).'))
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from core.cache import bump_model_version
+from core.rollups import new_deltas, payment_field
+from expenses.models import Expense, DailyExpenseSummary
+from sales.models import Sale, SaleItem, DailySalesSummary, DailyProductSales
+from sales.rollups import product_day_rows
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les cumuls journaliers des ventes et des dépenses à partir des données'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--to', dest='date_to', help='Date de fin incluse (AAAA-MM-JJ)')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for option, suffix in (('date_from', 'gte'), ('date_to', 'lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f'Date invalide : {options[option]} (format attendu : AAAA-MM-JJ)')
+                bounds[suffix] = day
+
+        def period(field):
+            return {f'{field}__{suffix}': day for suffix, day in bounds.items()}
+
+        with transaction.atomic():
+            # Ventes : une requête GROUP BY jour / moyen de paiement, une autre pour les unités
+            sales = new_deltas()
+            for row in (
+                Sale.objects.annotate(day=TruncDate('sale_date')).filter(**period('day'))
+                .order_by().values('day', 'payment_method')
+                .annotate(revenue=Sum('total_amount'), count=Count('id'))
+            ):
+                entry = sales[row['day']]
+                entry['revenue'] += row['revenue'] or 0
+                entry['sale_count'] += row['count']
+                entry[payment_field(row['payment_method'])] += row['revenue'] or 0
+            products = []
+            for row in product_day_rows(
+                SaleItem.objects.annotate(sale_day=TruncDate('sale__sale_date')).filter(**period('sale_day'))
+            ):
+                sales[row['day']]['units'] += row['units'] or 0
+                products.append(DailyProductSales(
+                    day=row['day'], product_id=row['product_id'], units=row['units'] or 0,
+                    revenue=row['revenue'] or 0, sale_count=row['sale_count']
+                ))
+
+            DailySalesSummary.objects.filter(**period('day')).delete()
+            DailySalesSummary.objects.bulk_create(
+                [DailySalesSummary(day=day, **fields) for day, fields in sales.items()],
+                batch_size=500
+            )
+            DailyProductSales.objects.filter(**period('day')).delete()
+            DailyProductSales.objects.bulk_create(products, batch_size=500)
+
+            # Dépenses : une requête GROUP BY jour / moyen de paiement
+            expenses = new_deltas()
+            for row in (
+                Expense.objects.filter(**period('expense_date'))
+                .order_by().values('expense_date', 'payment_method')
+                .annotate(amount=Sum('amount'), count=Count('id'))
+            ):
+                entry = expenses[row['expense_date']]
+                entry['amount'] += row['amount'] or 0
+                entry['expense_count'] += row['count']
+                entry[payment_field(row['payment_method'])] += row['amount'] or 0
+
+            DailyExpenseSummary.objects.filter(**period('day')).delete()
+            DailyExpenseSummary.objects.bulk_create(
+                [DailyExpenseSummary(day=day, **fields) for day, fields in expenses.items()],
+                batch_size=500
+            )
+
+        bump_model_version(DailySalesSummary, DailyProductSales, DailyExpenseSummary)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Cumuls reconstruits : {len(sales)} jour(s) de ventes, {len(expenses)} jour(s) de dépenses.'
+        ))
@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from core import worker
+from core.jobs import claim_next_job, purge_finished_jobs, requeue_stale_jobs, run_job
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = "Exécute les jobs d'arrière-plan (rapports, imports, PDF) dans un pool de processus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2,
+                            help="Nombre de processus (0 : exécution dans le processus courant)")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Délai en secondes entre deux recherches de jobs en attente")
+        parser.add_argument('--once', action='store_true',
+                            help="S'arrête quand la file est vide au lieu d'attendre de nouveaux jobs")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'{requeued} job(s) abandonné(s) remis en attente.'))
+        purged = purge_finished_jobs()
+        if purged:
+            self.stdout.write(self.style.SUCCESS(f'{purged} ancien(s) job(s) et leurs fichiers supprimés.'))
+
+        processes = options['processes']
+        if processes <= 0:
+            self._run_inline(options)
+            return
+
+        # Pas de connexion ouverte partagée avec les processus du pool
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=worker.init_process,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Worker démarré avec {processes} processus.'))
+        running = {}
+        try:
+            while True:
+                for future in [future for future in running if future.done()]:
+                    self._collect(running.pop(future), future)
+                while len(running) < processes:
+                    job_id = claim_next_job()
+                    if job_id is None:
+                        break
+                    running[pool.submit(worker.execute, job_id)] = job_id
+                if options['once'] and not running:
+                    break
+                close_old_connections()
+                time.sleep(options['poll_interval'] if not running else min(options['poll_interval'], 0.5))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Arrêt demandé, attente des jobs en cours...'))
+        finally:
+            pool.shutdown(wait=True)
+
+    def _run_inline(self, options):
+        while True:
+            job_id = claim_next_job()
+            if job_id is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self._report(job_id, run_job(job_id))
+
+    def _collect(self, job_id, future):
+        try:
+            outcome = future.result()
+        except Exception as e:
+            # Processus du pool arrêté brutalement (mémoire, signal...)
+            Job.objects.filter(pk=job_id, status='running').update(
+                status='failed', error=str(e) or e.__class__.__name__, finished_at=timezone.now()
+            )
+            outcome = 'failed'
+        self._report(job_id, outcome)
+
+    def _report(self, job_id, outcome):
+        if outcome == 'succeeded':
+            self.stdout.write(self.style.SUCCESS(f'✓ Job {job_id} terminé.'))
+        else:
+            self.stdout.write(self.style.ERROR(f'✗ Job {job_id} échoué.'))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['prefix', '-year'],
+                'constraints': [models.UniqueConstraint(fields=('prefix', 'year'), name='unique_document_counter')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_document_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100, unique=True)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['label'],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from account.models import User
+
+
+class IdempotencyKey(models.Model):
+    """Réponse enregistrée pour une requête POST rejouée avec le même en-tête Idempotency-Key"""
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='idempotency_keys')
+    path = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} - {self.path}"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'user', 'path'], name='unique_idempotency_key'),
+        ]
+        indexes = [models.Index(fields=['created_at'])]
+
+
+class Job(models.Model):
+    """Traitement long (rapport, import, PDF) exécuté hors requête par `run_worker`"""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('succeeded', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    result_file = models.FileField(upload_to='jobs/', max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} - {self.get_status_display()}"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+
+class DocumentCounter(models.Model):
+    """Dernier numéro attribué pour un préfixe de document (INV, ORD...) et une année"""
+    prefix = models.CharField(max_length=20)
+    year = models.PositiveSmallIntegerField()
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year} : {self.last_value}"
+
+    class Meta:
+        ordering = ['prefix', '-year']
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'year'], name='unique_document_counter'),
+        ]
+
+
+class ModelVersion(models.Model):
+    """Compteur de version d'un modèle, partagé par tous les processus (cache des réponses)"""
+    label = models.CharField(max_length=100, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.label} : {self.value}"
+
+    class Meta:
+        ordering = ['label']
@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import DocumentCounter
+
+# Numéros réservés d'avance par ce processus, par (préfixe, année) ; mode bloc uniquement
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def format_number(prefix, year, value):
+    """Numéro de document « PREFIXE-AAAA-000123 »"""
+    return f"{prefix}-{year}-{value:06d}"
+
+
+def allocate_numbers(prefix, count=1, year=None):
+    """
+    Réserve `count` numéros consécutifs pour le préfixe et l'année, en une seule requête
+    (insertion du compteur ou incrément atomique, avec RETURNING) ; retourne leurs valeurs.
+
+    Appelée dans la transaction qui crée le document : si celle-ci est annulée, le
+    compteur l'est aussi et la numérotation reste sans trou.
+    """
+    year = year or timezone.localdate().year
+    table = connection.ops.quote_name(DocumentCounter._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (prefix, year, last_value) VALUES (%s, %s, %s) "
+            f"ON CONFLICT (prefix, year) DO UPDATE SET last_value = {table}.last_value + excluded.last_value "
+            f"RETURNING last_value",
+            [prefix, year, count],
+        )
+        last_value = cursor.fetchone()[0]
+    return range(last_value - count + 1, last_value + 1)
+
+
+def next_number(prefix, year=None):
+    """
+    Prochain numéro de document du préfixe. Avec une taille de bloc configurée dans
+    DOCUMENT_NUMBER_BLOCK_SIZES, les numéros sont réservés par blocs et distribués depuis
+    la mémoire du processus : ils restent uniques, mais plus strictement croissants
+    entre processus ni sans trou (blocs non utilisés au redémarrage).
+    """
+    year = year or timezone.localdate().year
+    block_size = settings.DOCUMENT_NUMBER_BLOCK_SIZES.get(prefix, 1)
+    if block_size <= 1:
+        return format_number(prefix, year, allocate_numbers(prefix, 1, year)[0])
+
+    key = (prefix, year)
+    with _blocks_lock:
+        reserved = _blocks.get(key)
+        if reserved:
+            return format_number(prefix, year, reserved.popleft())
+
+    values = allocate_numbers(prefix, block_size, year)
+
+    def publish():
+        with _blocks_lock:
+            _blocks.setdefault(key, deque()).extend(values[1:])
+
+    # Le reste du bloc n'est partagé qu'une fois la réservation validée : si la
+    # transaction est annulée, le compteur revient en arrière et ces numéros aussi
+    transaction.on_commit(publish)
+    return format_number(prefix, year, values[0])
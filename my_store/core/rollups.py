@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from .cache import bump_model_version
+
+# Moyens de paiement ayant une colonne dédiée dans les tables de cumuls journaliers
+PAYMENT_METHODS = ('cash', 'card', 'check', 'transfer', 'other')
+
+
+def payment_field(payment_method):
+    """Colonne de cumul correspondant à un moyen de paiement (repli sur 'other')"""
+    return f"{payment_method if payment_method in PAYMENT_METHODS else 'other'}_amount"
+
+
+def new_deltas():
+    """Variations à appliquer, sous la forme {jour: {champ: variation}}"""
+    return defaultdict(lambda: defaultdict(int))
+
+
+def apply_rollup_deltas(model, deltas, key_fields=('day',)):
+    """
+    Applique des variations {clé: {champ: variation}} à une table de cumuls : la clé est
+    le jour, ou un tuple de valeurs pour `key_fields` (ex. (jour, product_id)).
+    Les lignes manquantes sont créées en une insertion, puis chaque ligne est incrémentée
+    par une mise à jour atomique côté base (F() + variation).
+    """
+    deltas = {key: {field: value for field, value in fields.items() if value} for key, fields in deltas.items()}
+    deltas = {key: fields for key, fields in deltas.items() if fields}
+    if not deltas:
+        return
+    lookups = {
+        key: dict(zip(key_fields, key if isinstance(key, tuple) else (key,)))
+        for key in deltas
+    }
+    model.objects.bulk_create([model(**lookup) for lookup in lookups.values()], ignore_conflicts=True)
+    for key, fields in deltas.items():
+        model.objects.filter(**lookups[key]).update(**{field: F(field) + value for field, value in fields.items()})
+    bump_model_version(model)
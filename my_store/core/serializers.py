@@ -0,0 +1,77 @@
+import json
+
+from rest_framework import serializers
+
+from .jobs import JOB_KINDS
+from .models import Job
+
+
+class ParamsField(serializers.JSONField):
+    """Objet JSON, ou chaîne JSON quand la demande est envoyée en multipart"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                self.fail('invalid')
+        return super().to_internal_value(data)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    kind = serializers.ChoiceField(choices=JOB_KINDS)
+    params = ParamsField(required=False, default=dict)
+    file = serializers.FileField(write_only=True, required=False)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'params', 'file', 'status', 'status_display', 'progress',
+            'result', 'error', 'download_url', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = ['status', 'progress', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_download_url(self, obj):
+        if obj.status != 'succeeded' or not obj.result_file:
+            return None
+        path = f'/api/jobs/{obj.pk}/download/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Les paramètres doivent être un objet JSON.")
+        return value
+
+    def validate(self, attrs):
+        kind = attrs['kind']
+        params = attrs.get('params') or {}
+        if kind == 'product_import':
+            upload = attrs.get('file')
+            if upload is None:
+                raise serializers.ValidationError({'file': "Aucun fichier fourni. Veuillez envoyer un fichier Excel."})
+            if not upload.name.endswith(('.xlsx', '.xls')):
+                raise serializers.ValidationError({'file': "Le fichier doit être au format Excel (.xlsx ou .xls)"})
+        elif kind == 'invoice_pdf':
+            from invoices.models import Invoice
+            invoice_id = str(params.get('invoice', ''))
+            if not invoice_id.isdigit() or not Invoice.objects.filter(pk=invoice_id).exists():
+                raise serializers.ValidationError({'params': "Facture introuvable (paramètre 'invoice')."})
+        elif kind == 'invoice_pdf_bulk':
+            if params.get('format', 'zip') not in ('zip', 'pdf'):
+                raise serializers.ValidationError({'params': "Format inconnu : 'zip' ou 'pdf'."})
+        elif params.get('format', 'xlsx') not in ('xlsx', 'csv'):
+            raise serializers.ValidationError({'params': "Format inconnu : 'xlsx' ou 'csv'."})
+        return attrs
+
+    def create(self, validated_data):
+        from .jobs import save_upload
+
+        upload = validated_data.pop('file', None)
+        if upload is not None:
+            validated_data['params'] = {
+                **validated_data.get('params', {}), 'upload': save_upload(upload), 'filename': upload.name
+            }
+        return super().create(validated_data)
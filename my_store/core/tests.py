@@ -0,0 +1,287 @@
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APITestCase
+
+from account.models import User
+from products.ledger import apply_stock_deltas
+from products.models import Product
+from sales.models import Sale
+from . import numbering
+from .jobs import claim_next_job, run_job
+from .models import DocumentCounter, IdempotencyKey, Job
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+        self.payload = {'items': [{'product': self.product.id, 'quantity': 2, 'unit_price': '2500.00'}]}
+
+    def _post(self, payload, key='cle-1'):
+        return self.client.post('/api/sales/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response_without_writing(self):
+        first = self._post(self.payload)
+        second = self._post(self.payload)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self._post(self.payload)
+        other = dict(self.payload, notes='autre')
+        self.assertEqual(self._post(other).status_code, 422)
+
+    def test_validation_error_releases_key(self):
+        self.assertEqual(self._post({'items': [{'product': 999}]}).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_integrity_error_from_handler_is_not_taken_for_key_race(self):
+        from unittest import mock
+        from django.db import IntegrityError
+        from sales.serializers import SaleCreateSerializer
+        
+        with mock.patch.object(SaleCreateSerializer, 'create', side_effect=IntegrityError('contrainte')):
+            with self.assertRaisesMessage(IntegrityError, 'contrainte'):
+                self._post(self.payload)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_requests_without_key_are_not_recorded(self):
+        self.client.post('/api/sales/', self.payload, format='json')
+        self.client.post('/api/sales/', self.payload, format='json')
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get('/api/products/')
+        # Seules la requête de calcul de l'ETag et les lectures des versions partagées
+        # (ETag puis clé de cache) touchent la base
+        with self.assertNumQueries(3):
+            second = self.client.get('/api/products/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.client.get('/api/cache/stats/').data, {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_save_and_bulk_update_invalidate(self):
+        self.client.get('/api/products/')
+        # Les versions sont incrémentées au commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Radio FM'
+            self.product.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name'], 'Radio FM')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({self.product.id: 3})
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['stock'], 8)
+
+    def test_write_in_another_process_invalidates(self):
+        from .cache import _bump
+        from .models import ModelVersion
+        
+        self.client.get('/api/products/')
+        # Écriture dans un autre worker : seul le compteur partagé change, pas la mémoire locale
+        _bump(['products.product'])
+        first = ModelVersion.objects.get(label='products.product').value
+        _bump(['products.product', 'products.category'])
+        self.assertEqual(ModelVersion.objects.get(label='products.product').value, first + 1)
+        self.assertEqual(self.client.get('/api/products/')['X-Cache'], 'MISS')
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+
+    def test_list_answers_304_when_unchanged(self):
+        first = self.client.get('/api/sales/')
+        etag = first['ETag']
+        # Agrégat de l'ETag et lecture des versions partagées
+        with self.assertNumQueries(2):
+            second = self.client.get('/api/sales/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(second.content, b'')
+
+        self.client.post('/api/sales/', {
+            'items': [{'product': self.product.id, 'quantity': 1, 'unit_price': '2500.00'}],
+        }, format='json')
+        third = self.client.get('/api/sales/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], etag)
+
+    def test_detail_etag_changes_with_stock_update(self):
+        url = f'/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        apply_stock_deltas({self.product.id: -2})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 3)
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='gerant', password='secret')
+        self.client.force_authenticate(self.user)
+
+    def test_report_job_enqueue_poll_and_download(self):
+        response = self.client.post('/api/jobs/', {'kind': 'sales_report', 'params': {'format': 'csv'}}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/download/').status_code, 404)
+
+        call_command('run_worker', processes=0, once=True, stdout=io.StringIO())
+
+        job = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['progress'], 100)
+        self.assertEqual(job['result'], {'rows': 0})
+        download = self.client.get(f'/api/jobs/{job_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('rapport_ventes_all_all.csv', download['Content-Disposition'])
+        content = b''.join(download.streaming_content).decode('utf-8')
+        self.assertIn('TOTAL GÉNÉRAL', content)
+
+    def test_product_import_job(self):
+        Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Designation', 'Quantite'])
+        sheet.append(['Radio', 12])
+        sheet.append(['Torche', 3])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile('stock.xlsx', buffer.getvalue())
+
+        response = self.client.post('/api/jobs/', {'kind': 'product_import', 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+
+        job_id = claim_next_job()
+        self.assertEqual(job_id, response.json()['id'])
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(run_job(job_id), 'succeeded')
+
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual(job.result, {'created': 1, 'updated': 1, 'errors': None})
+        self.assertEqual(Product.objects.get(name='Radio').stock, 12)
+
+    def test_failed_job_records_error(self):
+        job = Job.objects.create(kind='product_import', params={'upload': 'jobs/uploads/absent.xlsx'}, created_by=self.user)
+        with self.assertLogs('core.jobs', level='ERROR'):
+            self.assertEqual(run_job(claim_next_job()), 'failed')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error)
+
+    def test_jobs_are_private_to_their_owner(self):
+        other = User.objects.create_user(username='autre', password='secret')
+        job = Job.objects.create(kind='sales_report', created_by=other)
+        self.assertEqual(self.client.get(f'/api/jobs/{job.id}/').status_code, 404)
+
+    def test_result_files_are_private_and_purged(self):
+        from datetime import timedelta
+        
+        job = Job.objects.create(kind='sales_report', params={'format': 'csv'}, created_by=self.user)
+        self.assertEqual(run_job(claim_next_job()), 'succeeded')
+        job.refresh_from_db()
+        # Chemin aléatoire : pas de /jobs/<id>/ à deviner sous /media/
+        self.assertNotIn(f'jobs/{job.id}/', job.result_file.name)
+        path = job.result_file.path
+        self.assertTrue(os.path.exists(path))
+
+        call_command('purge_jobs', stdout=io.StringIO())
+        self.assertTrue(Job.objects.filter(pk=job.pk).exists())
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=8))
+        call_command('purge_jobs', stdout=io.StringIO())
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    def test_unknown_invoice_is_rejected(self):
+        response = self.client.post('/api/jobs/', {'kind': 'invoice_pdf', 'params': {'invoice': 999}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DocumentNumberTests(APITestCase):
+    def setUp(self):
+        numbering._blocks.clear()
+        self.addCleanup(numbering._blocks.clear)
+
+    def test_numbers_are_sequential_per_prefix_and_year(self):
+        with self.assertNumQueries(1):
+            first = numbering.next_number('INV', year=2025)
+        self.assertEqual(first, 'INV-2025-000001')
+        self.assertEqual(numbering.next_number('INV', year=2025), 'INV-2025-000002')
+        self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000001')
+        self.assertEqual(numbering.next_number('INV', year=2026), 'INV-2026-000001')
+        self.assertEqual(DocumentCounter.objects.get(prefix='INV', year=2025).last_value, 2)
+
+    def test_rolled_back_allocation_leaves_no_gap(self):
+        numbering.next_number('INV', year=2025)
+        try:
+            with transaction.atomic():
+                numbering.next_number('INV', year=2025)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(numbering.next_number('INV', year=2025), 'INV-2025-000002')
+
+    def test_allocate_contiguous_range(self):
+        numbering.allocate_numbers('ORD', 1, year=2025)
+        self.assertEqual(list(numbering.allocate_numbers('ORD', 3, year=2025)), [2, 3, 4])
+
+    @override_settings(DOCUMENT_NUMBER_BLOCK_SIZES={'ORD': 3})
+    def test_block_mode_serves_reserved_numbers_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000001')
+        with self.assertNumQueries(0):
+            self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000002')
+            self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000003')
+        self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000004')
+        self.assertEqual(DocumentCounter.objects.get(prefix='ORD').last_value, 6)
+
+    @override_settings(DOCUMENT_NUMBER_BLOCK_SIZES={'ORD': 3})
+    def test_block_from_rolled_back_transaction_is_not_reused(self):
+        try:
+            with transaction.atomic():
+                numbering.next_number('ORD', year=2025)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(numbering.next_number('ORD', year=2025), 'ORD-2025-000001')
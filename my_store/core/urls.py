@@ -0,0 +1,11 @@
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+router = DefaultRouter()
+router.register(r'jobs', views.JobViewSet, basename='job')
+
+urlpatterns = [
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+] + router.urls
@@ -0,0 +1,57 @@
+import os
+
+from django.http import FileResponse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .cache import cache_stats
+from .models import Job
+from .serializers import JobSerializer
+
+
+class CacheStatsView(APIView):
+    """Compteurs de succès / échecs du cache des réponses"""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Jobs d'arrière-plan : POST pour mettre un traitement en file (réponse 202),
+    GET pour suivre son statut et sa progression, puis `download` pour le résultat.
+    Les jobs sont exécutés par la commande `run_worker`.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        status_filter = self.request.query_params.get('status', None)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(created_by=request.user)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Fichier produit par le job (rapport, PDF), une fois terminé"""
+        job = self.get_object()
+        if job.status != 'succeeded' or not job.result_file:
+            return Response(
+                {'error': "Aucun fichier disponible pour ce job.", 'status': job.status},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=os.path.basename(job.result_file.name))
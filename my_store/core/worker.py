@@ -0,0 +1,24 @@
+"""
+Points d'entrée des processus du pool de `run_worker`. Démarrés en mode « spawn »,
+ces processus importent ce module avant que Django soit initialisé : les modèles
+ne sont importés qu'une fois django.setup() exécuté.
+"""
+
+
+def init_process():
+    """Processus du pool : Django est initialisé à neuf, sans connexion héritée"""
+    import django
+    django.setup()
+
+    from django.db import connections
+    connections.close_all()
+
+
+def execute(job_id):
+    from django.db import close_old_connections
+    from .jobs import run_job
+
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_alter_customer_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_at'], name='customers_c_created_1ed0f4_idx'),
+        ),
+    ]
@@ -22,4 +22,5 @@ class Customer(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
@@ -2,11 +2,13 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from core.cache import CachedListMixin
+from core.conditional import ConditionalGetMixin
 from .models import Customer
 from .serializers import CustomerSerializer, CustomerListSerializer
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     permission_classes = [IsAuthenticated]
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Expense, ExpenseCategory
+from django.db import transaction
+from . import rollups
+from .models import Expense, ExpenseCategory, DailyExpenseSummary
 
 
 @admin.register(ExpenseCategory)
@@ -14,3 +16,29 @@ class ExpenseAdmin(admin.ModelAdmin):
     list_filter = ['category', 'payment_method', 'expense_date', 'created_at']
     search_fields = ['description']
     readonly_fields = ['created_at', 'updated_at']
+
+    # Cumuls journaliers mis à jour dans la même transaction, comme dans l'API
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                rollups.record_expense(Expense.objects.get(pk=obj.pk), sign=-1)
+            super().save_model(request, obj, form, change)
+            rollups.record_expense(obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            rollups.record_expense(Expense.objects.get(pk=obj.pk), sign=-1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for expense in queryset.only('id', 'amount', 'expense_date', 'payment_method'):
+                rollups.record_expense(expense, sign=-1)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(DailyExpenseSummary)
+class DailyExpenseSummaryAdmin(admin.ModelAdmin):
+    list_display = ['day', 'amount', 'expense_count']
+    date_hierarchy = 'day'
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-17 20:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['expense_date'], name='expenses_ex_expense_cf8a73_idx'),
+        ),
+    ]
@@ -44,4 +44,24 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-expense_date']
+        indexes = [models.Index(fields=['expense_date'])]
 
+
+
+class DailyExpenseSummary(models.Model):
+    """Cumul journalier des dépenses, tenu à jour dans les mêmes transactions que les dépenses"""
+    day = models.DateField(unique=True)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    expense_count = models.IntegerField(default=0)
+    cash_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    card_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    check_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    transfer_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    other_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"Dépenses du {self.day.strftime('%d/%m/%Y')} : {self.amount}"
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = "Daily expense summaries"
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from my_store.exports import Report, header_row, total_row, write_only_sheet, xlsx_values
+from my_store.streaming import STREAM_CHUNK_SIZE
+from .models import Expense
+
+CENT = Decimal('0.01')
+
+
+class ExpenseReport(Report):
+    """
+    Rapport des dépenses : détail lu en flux (catégories jointes), total calculé par
+    la base en Decimal et, avec `by_category`, une feuille « Par catégorie » issue
+    d'une seule requête GROUP BY (classeur Excel uniquement).
+    """
+    header_color = "C5504B"
+
+    def __init__(self, queryset, by_category, *args):
+        super().__init__(*args)
+        self.queryset = queryset
+        self.by_category = by_category
+        self._categories = None
+
+    def category_totals(self):
+        """Lignes {'category__name', 'count', 'amount'} par montant décroissant"""
+        if self._categories is None:
+            self._categories = list(
+                self.queryset.order_by().values('category__name')
+                .annotate(count=Count('id'), amount=Sum('amount'))
+                .order_by('-amount', 'category__name')
+            )
+            # SQLite additionne les décimaux en virgule flottante : arrondi au centime
+            for row in self._categories:
+                row['amount'] = row['amount'].quantize(CENT)
+        return self._categories
+
+    def grand_total(self, running_total):
+        if self.by_category:
+            # La requête groupée donne aussi le total : pas d'agrégat supplémentaire
+            return sum((row['amount'] for row in self.category_totals()), Decimal('0.00'))
+        total = self.queryset.order_by().aggregate(total=Sum('amount'))['total']
+        return (total or Decimal('0.00')).quantize(CENT)
+
+    def extra_sheets(self, workbook):
+        if not self.by_category:
+            return
+        rows = self.category_totals()
+        total = sum((row['amount'] for row in rows), Decimal('0.00'))
+        ws = write_only_sheet(workbook, "Par catégorie", [25, 12, 15, 12])
+        ws.append(header_row(ws, ['Catégorie', 'Nombre', 'Montant', '% du total'], self.header_color))
+        for row in rows:
+            share = (row['amount'] * 100 / total).quantize(CENT) if total else Decimal('0.00')
+            ws.append(xlsx_values([row['category__name'] or 'Sans catégorie', row['count'], row['amount'], share]))
+        ws.append([])
+        ws.append(total_row(ws, ['TOTAL GÉNÉRAL', sum(row['count'] for row in rows), total, '']))
+
+
+def expenses_report(params):
+    """
+    Rapport des dépenses d'une période (date_from / date_to, AAAA-MM-JJ) ;
+    by_category=true ajoute les sous-totaux par catégorie.
+    """
+    date_from = params.get('date_from') or None
+    date_to = params.get('date_to') or None
+    by_category = str(params.get('by_category', '')).lower() in ('1', 'true', 'yes')
+
+    queryset = Expense.objects.all()
+    if date_from:
+        queryset = queryset.filter(expense_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(expense_date__lte=date_to)
+
+    queryset = queryset.order_by('expense_date', 'id')
+    return ExpenseReport(
+        queryset,
+        by_category,
+        f"rapport_depenses_{date_from or 'all'}_{date_to or 'all'}",
+        "Rapport des Dépenses",
+        ['Date', 'Description', 'Catégorie', 'Montant', 'Méthode de Paiement', 'Notes'],
+        [12, 40, 20, 12, 15, 30],
+        _expense_report_lines(queryset),
+        3,
+    )
+
+
+def _expense_report_lines(queryset):
+    """Lignes du rapport des dépenses (valeurs, montant), catégories jointes, lues par paquets"""
+    payment_methods = dict(Expense._meta.get_field('payment_method').choices)
+    rows = queryset.values_list(
+        'expense_date', 'description', 'category__name', 'amount', 'payment_method', 'notes'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    for expense_date, description, category, amount, payment_method, notes in rows:
+        yield [
+            expense_date.strftime('%d/%m/%Y'),
+            description,
+            category or '-',
+            amount,
+            payment_methods.get(payment_method, payment_method),
+            notes or '-',
+        ], amount
@@ -0,0 +1,12 @@
+from core.rollups import apply_rollup_deltas, new_deltas, payment_field
+from .models import DailyExpenseSummary
+
+
+def record_expense(expense, sign=1):
+    """Ajoute (sign=1) ou retire (sign=-1) une dépense du cumul de son jour"""
+    deltas = new_deltas()
+    entry = deltas[expense.expense_date]
+    entry['amount'] += sign * expense.amount
+    entry['expense_count'] += sign
+    entry[payment_field(expense.payment_method)] += sign * expense.amount
+    apply_rollup_deltas(DailyExpenseSummary, deltas)
@@ -1,3 +1,95 @@
-from django.test import TestCase
+import io
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from openpyxl import load_workbook
+from rest_framework.test import APITestCase
+
+from account.models import User
+from .models import DailyExpenseSummary, Expense, ExpenseCategory
+
+
+class ExpenseExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='gerant', password='secret')
+        self.client.force_authenticate(self.user)
+        loyer = ExpenseCategory.objects.create(name='Loyer')
+        transport = ExpenseCategory.objects.create(name='Transport')
+        for day, category, description, amount in (
+            (date(2025, 3, 1), loyer, 'Loyer mars', '150000.00'),
+            (date(2025, 3, 2), transport, 'Taxi', '2500.10'),
+            (date(2025, 3, 3), transport, 'Livraison', '4000.20'),
+            (date(2025, 3, 4), None, 'Divers', '0.10'),
+        ):
+            Expense.objects.create(
+                category=category, description=description, amount=Decimal(amount), expense_date=day
+            )
+
+    def test_csv_export_total_from_database(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/expenses/export_report/', {'format': 'csv'})
+            content = b''.join(response.streaming_content).decode('utf-8')
+        lines = content.lstrip('﻿').splitlines()
+        self.assertEqual(lines[0], 'Date;Description;Catégorie;Montant;Méthode de Paiement;Notes')
+        self.assertEqual(lines[1], '01/03/2025;Loyer mars;Loyer;150000.00;Espèces;-')
+        self.assertEqual(lines[4], '04/03/2025;Divers;-;0.10;Espèces;-')
+        self.assertEqual(lines[-1], 'TOTAL GÉNÉRAL;;;156500.40;;')
+
+    def test_xlsx_export_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/expenses/export_report/')
+            content = b''.join(response.streaming_content)
+        self.assertIn('rapport_depenses_all_all.xlsx', response['Content-Disposition'])
+        workbook = load_workbook(io.BytesIO(content))
+        self.assertEqual(workbook.sheetnames, ['Rapport des Dépenses'])
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 1 + 4 + 2)
+        self.assertEqual(rows[2][2], 'Transport')
+        self.assertEqual(rows[-1][:4], ('TOTAL GÉNÉRAL', None, None, 156500.4))
+
+    def test_category_subtotal_sheet(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/expenses/export_report/', {'by_category': 'true', 'date_from': '2025-03-02'})
+            content = b''.join(response.streaming_content)
+        workbook = load_workbook(io.BytesIO(content))
+        self.assertEqual(workbook.sheetnames, ['Rapport des Dépenses', 'Par catégorie'])
+        detail = list(workbook['Rapport des Dépenses'].iter_rows(values_only=True))
+        self.assertEqual(detail[-1][3], 6500.4)
+        rows = list(workbook['Par catégorie'].iter_rows(values_only=True))
+        self.assertEqual(rows[1], ('Transport', 2, 6500.3, 100.0))
+        self.assertEqual(rows[2], ('Sans catégorie', 1, 0.1, 0.0))
+        self.assertEqual(rows[-1][:3], ('TOTAL GÉNÉRAL', 3, 6500.4))
+
+
+class ExpenseAdminRollupTests(APITestCase):
+    def setUp(self):
+        from django.test import Client
+
+        self.admin = User.objects.create_superuser(username='admin', password='secret')
+        self.browser = Client()
+        self.browser.force_login(self.admin)
+
+    def _form(self, amount, day='2025-03-01', payment_method='cash'):
+        return {
+            'description': 'Taxi', 'amount': amount, 'expense_date': day,
+            'payment_method': payment_method, 'notes': '', 'created_by': self.admin.id,
+        }
+
+    def _summaries(self):
+        return list(
+            DailyExpenseSummary.objects.exclude(expense_count=0).order_by('day')
+            .values_list('day', 'amount', 'expense_count', 'cash_amount', 'card_amount')
+        )
+
+    def test_admin_writes_update_daily_summary(self):
+        response = self.browser.post('/admin/expenses/expense/add/', self._form('2500.00'))
+        self.assertEqual(response.status_code, 302)
+        expense = Expense.objects.get()
+        self.browser.post(
+            f'/admin/expenses/expense/{expense.id}/change/', self._form('3000.00', '2025-03-02', 'card')
+        )
+        self.assertEqual(self._summaries(), [(date(2025, 3, 2), Decimal('3000.00'), 1, Decimal('0.00'), Decimal('3000.00'))])
+
+        self.browser.post(f'/admin/expenses/expense/{expense.id}/delete/', {'post': 'yes'})
+        self.assertFalse(Expense.objects.exists())
+        self.assertEqual(self._summaries(), [])
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfWriter
+
+from .models import Invoice
+from .pdf import cached_invoice_pdf
+from .reports import filter_invoices
+
+BULK_FORMATS = ('zip', 'pdf')
+
+# Factures envoyées ensemble à un processus du pool
+BULK_CHUNK_SIZE = 25
+
+# En dessous, le démarrage du pool coûte plus que le rendu lui-même
+POOL_MIN_INVOICES = 40
+
+
+def bulk_invoices(params):
+    """Factures des filtres de la liste (customer, date_from, date_to) : factures et clients, puis lignes"""
+    queryset = Invoice.objects.select_related('customer').prefetch_related('items')
+    return list(filter_invoices(queryset, params).order_by('date', 'invoice_number'))
+
+
+def _render_chunk(invoices):
+    """Processus du pool : les factures arrivent avec client et lignes, sans accès à la base"""
+    return [cached_invoice_pdf(invoice)[0] for invoice in invoices]
+
+
+def render_invoice_pdfs(invoices, processes=None, progress=None):
+    """
+    PDF de chaque facture (chemins dans le cache, dans l'ordre des factures). Le rendu
+    reportlab occupe le processeur : au-delà de POOL_MIN_INVOICES, il est réparti sur un
+    pool de processus ; processes=0 force le rendu dans le processus courant.
+    """
+    chunks = [invoices[i:i + BULK_CHUNK_SIZE] for i in range(0, len(invoices), BULK_CHUNK_SIZE)]
+    if processes is None:
+        processes = min(os.cpu_count() or 1, len(chunks))
+    if processes <= 1 or len(invoices) < POOL_MIN_INVOICES:
+        results = map(_render_chunk, chunks)
+        pool = None
+    else:
+        from core.worker import init_process
+
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_process,
+        )
+        results = pool.map(_render_chunk, chunks)
+
+    paths = []
+    try:
+        for paths_chunk in results:
+            paths += paths_chunk
+            if progress:
+                progress(len(paths) * 100 / len(invoices))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return paths
+
+
+def pdf_name(invoice):
+    return f"facture_{invoice.invoice_number}.pdf".replace('/', '-')
+
+
+def write_bulk_pdfs(params, output, output_format='zip', processes=None, progress=None):
+    """
+    Écrit dans `output` les PDF des factures filtrées : une archive ZIP d'un PDF par
+    facture, ou un seul PDF avec toutes les factures. Dans les deux cas, chaque facture
+    est rendue (ou relue du cache) par render_invoice_pdfs, en parallèle au-delà de
+    POOL_MIN_INVOICES ; ce processus ne fait qu'assembler. Retourne le nombre de factures.
+    """
+    invoices = bulk_invoices(params)
+    paths = render_invoice_pdfs(invoices, processes=processes, progress=progress)
+    if output_format == 'pdf':
+        # Pages des PDF de chaque facture mises à la suite, sans nouveau rendu
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path)
+        writer.write(output)
+        return len(invoices)
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for invoice, path in zip(invoices, paths):
+            archive.write(path, pdf_name(invoice))
+    return len(invoices)
+
+
+def bulk_filename(params, output_format):
+    return f"factures_{params.get('date_from') or 'all'}_{params.get('date_to') or 'all'}.{output_format}"
+
+
+def run_bulk_pdf_job(job, context):
+    """Job `invoice_pdf_bulk` : PDF des factures filtrées, en ZIP ou en un seul PDF"""
+    output_format = job.params.get('format', 'zip')
+    with context.open_result(bulk_filename(job.params, output_format)) as handle:
+        count = write_bulk_pdfs(job.params, handle, output_format, progress=context.set_progress)
+    return {'invoices': count}
@@ -0,0 +1,43 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from invoices.models import Invoice
+from invoices.rendering import InvoiceRenderEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le temps de rendu PDF d'une facture : moteur recréé à chaque facture "
+        "(toute la préparation à chaque fois) puis moteur partagé du processus"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoice', type=int, help='Facture à rendre (id ; la plus récente par défaut)')
+        parser.add_argument('--iterations', type=int, default=100, help='Nombre de rendus par mesure (100 par défaut)')
+
+    def handle(self, *args, **options):
+        queryset = Invoice.objects.select_related('customer').prefetch_related('items')
+        invoice = queryset.filter(pk=options['invoice']).first() if options['invoice'] else queryset.first()
+        if invoice is None:
+            raise CommandError('Aucune facture à rendre.')
+        iterations = max(options['iterations'], 1)
+        # Lignes lues une fois : seul le rendu est mesuré
+        list(invoice.items.all())
+
+        cold = self._measure(lambda: InvoiceRenderEngine().render(invoice, io.BytesIO()), iterations)
+        engine = InvoiceRenderEngine()
+        warm = self._measure(lambda: engine.render(invoice, io.BytesIO()), iterations)
+
+        self.stdout.write(f'Facture {invoice.invoice_number} ({len(invoice.items.all())} ligne(s)), {iterations} rendus :')
+        self.stdout.write(f'  moteur recréé à chaque rendu : {cold:.2f} ms/facture')
+        self.stdout.write(f'  moteur partagé               : {warm:.2f} ms/facture')
+        self.stdout.write(self.style.SUCCESS(f'✓ Gain : {(1 - warm / cold) * 100:.0f} %'))
+
+    @staticmethod
+    def _measure(render, iterations):
+        render()  # préchauffage (polices, imports)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render()
+        return (time.perf_counter() - start) * 1000 / iterations
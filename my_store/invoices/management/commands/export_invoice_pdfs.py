@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from invoices.bulk import BULK_FORMATS, bulk_filename, write_bulk_pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère les PDF des factures d'une période (et/ou d'un client) : une archive ZIP "
+        "d'un PDF par facture, ou un seul PDF pour l'impression"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--to', dest='date_to', help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument('--customer', type=int, help='Limiter aux factures de ce client (id)')
+        parser.add_argument('--format', choices=BULK_FORMATS, default='zip', help='zip (par défaut) ou pdf')
+        parser.add_argument('--output', help='Fichier de sortie (factures_<début>_<fin>.<format> par défaut)')
+        parser.add_argument('--processes', type=int,
+                            help='Processus de rendu (nombre de processeurs par défaut, 0 : sans pool)')
+
+    def handle(self, *args, **options):
+        params = {}
+        for key in ('date_from', 'date_to'):
+            if options[key]:
+                if parse_date(options[key]) is None:
+                    raise CommandError(f'Date invalide : {options[key]} (attendu AAAA-MM-JJ)')
+                params[key] = options[key]
+        if options['customer']:
+            params['customer'] = options['customer']
+
+        output = options['output'] or bulk_filename(params, options['format'])
+        with open(output, 'wb') as handle:
+            count = write_bulk_pdfs(params, handle, options['format'], processes=options['processes'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} facture(s) écrite(s) dans {output}.'))
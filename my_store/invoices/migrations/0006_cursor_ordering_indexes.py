@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-17 20:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_cursor_ordering_indexes'),
+        ('invoices', '0005_alter_invoice_options'),
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['date'], name='invoices_in_date_b85670_idx'),
+        ),
+    ]
@@ -32,6 +32,7 @@ class Invoice(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [models.Index(fields=['date'])]
 
 
 class InvoiceItem(models.Model):
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils.http import quote_etag
+
+from .rendering import LOGO_PATHS, get_render_engine
+
+# À incrémenter quand la mise en page du PDF change : les fichiers en cache sont régénérés
+PDF_LAYOUT_VERSION = 2
+
+PDF_CACHE_DIR = os.path.join('invoices', 'pdf')
+
+
+def _logo_version():
+    for path in LOGO_PATHS:
+        if os.path.exists(path):
+            return f'{path}:{os.path.getmtime(path)}'
+    return ''
+
+
+def invoice_fingerprint(invoice):
+    """
+    Empreinte de tout ce qu'affiche le PDF : facture, nom du client, lignes, logo et
+    version de la mise en page. Les lignes sont lues via invoice.items.all() (préchargées
+    par la vue), comme le rendu.
+    """
+    parts = [
+        PDF_LAYOUT_VERSION, _logo_version(), invoice.pk, invoice.invoice_number, invoice.date.isoformat(),
+        invoice.subtotal, invoice.total_amount, invoice.notes,
+        invoice.customer.full_name if invoice.customer else '',
+    ]
+    for item in invoice.items.all():
+        parts += [item.description, item.quantity, item.unit_price]
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def _cache_dir(invoice_id):
+    return os.path.join(settings.MEDIA_ROOT, PDF_CACHE_DIR, str(invoice_id))
+
+
+def cached_invoice_pdf(invoice):
+    """
+    Chemin du PDF de la facture et son ETag. Le fichier n'est généré que si aucun PDF
+    ne correspond au contenu actuel ; les versions précédentes sont alors supprimées.
+    """
+    fingerprint = invoice_fingerprint(invoice)
+    directory = _cache_dir(invoice.pk)
+    path = os.path.join(directory, f'{fingerprint}.pdf')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : un fichier incomplet
+        # n'est jamais servi, même si deux requêtes génèrent le PDF en même temps
+        handle = tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False)
+        try:
+            with handle:
+                get_render_engine().render(invoice, handle)
+            os.replace(handle.name, path)
+        except BaseException:
+            os.remove(handle.name)
+            raise
+        for name in os.listdir(directory):
+            if name.endswith('.pdf') and name != os.path.basename(path):
+                os.remove(os.path.join(directory, name))
+    return path, quote_etag(fingerprint)
+
+
+def discard_invoice_pdfs(invoice_id):
+    shutil.rmtree(_cache_dir(invoice_id), ignore_errors=True)
+
+
+def _on_invoice_delete(sender, instance, **kwargs):
+    invoice_id = instance.pk
+    transaction.on_commit(lambda: discard_invoice_pdfs(invoice_id))
+
+
+def connect_signals():
+    """Supprime les PDF en cache d'une facture supprimée (les modifications changent l'empreinte)"""
+    from .models import Invoice
+
+    post_delete.connect(_on_invoice_delete, sender=Invoice, dispatch_uid='invoice-pdf-cache-delete')
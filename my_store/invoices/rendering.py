@@ -0,0 +1,415 @@
+import io
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm, inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from PIL import Image as PILImage
+
+logger = logging.getLogger(__name__)
+
+# Logos essayés dans l'ordre
+LOGO_PATHS = [
+    os.path.join(settings.BASE_DIR.parent, 'Logo Dkf.jpeg'),
+    os.path.join(settings.BASE_DIR.parent, 'react-app', 'public', 'logo-dkf.jpeg'),
+]
+
+# Le logo est affiché en 3 cm de côté ; 300 ppp suffisent à l'impression
+LOGO_SIZE = 3*cm
+LOGO_DPI = 300
+
+COMPANY_NAME = "SUPER DFK"
+
+COMPANY_INFO = [
+    "Vente de Matériels Électroniques et Divers",
+    "Sis au grand marché de Bobo Dioulasso",
+    "Derrière le marché 50m de L'église alliance chrétienne",
+    "Tel: +226 76656506 / 78018394"
+]
+
+# Tableau sans marges internes (en-tête logo/nom, ligne client/date)
+FLAT_TABLE_COMMANDS = [
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('TOPPADDING', (0, 0), (-1, -1), 0),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+]
+
+# Tableau des articles : en-tête (ligne 0), articles, puis TOTAL GENERAL (ligne -1)
+ITEMS_TABLE_COMMANDS = [
+    # En-tête
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+    ('ALIGN', (1, 0), (-1, 0), 'CENTER'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('TOPPADDING', (0, 0), (-1, 0), 8),
+    # Corps du tableau
+    ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -2), 10),
+    ('ALIGN', (0, 1), (0, -2), 'LEFT'),
+    ('ALIGN', (1, 1), (-1, -2), 'CENTER'),
+    ('BOTTOMPADDING', (0, 1), (-1, -2), 6),
+    ('TOPPADDING', (0, 1), (-1, -2), 6),
+    # Ligne TOTAL GENERAL
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 11),
+    ('ALIGN', (0, -1), (0, -1), 'LEFT'),
+    ('ALIGN', (3, -1), (3, -1), 'CENTER'),
+    ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
+    ('TOPPADDING', (0, -1), (-1, -1), 8),
+    # Bordures horizontales principales
+    ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),  # Ligne au-dessus de l'en-tête
+    ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),  # Ligne sous l'en-tête
+    ('LINEBELOW', (0, 1), (-1, -2), 1, colors.black),  # Ligne sous chaque article (et avant TOTAL)
+    ('LINEBELOW', (0, -1), (-1, -1), 1, colors.black),  # Ligne sous TOTAL
+    # Bordures verticales - gauche et droite (toutes les lignes)
+    ('LINEBEFORE', (0, 0), (0, -1), 1, colors.black),  # Bordure gauche complète
+    ('LINEAFTER', (-1, 0), (-1, -1), 1, colors.black),  # Bordure droite complète
+    # Bordures verticales internes entre colonnes
+    ('LINEBEFORE', (1, 0), (1, -1), 1, colors.black),  # Entre colonne 1 et 2
+    ('LINEBEFORE', (2, 0), (2, -1), 1, colors.black),  # Entre colonne 2 et 3
+    ('LINEBEFORE', (3, 0), (3, -1), 1, colors.black),  # Entre colonne 3 et 4
+]
+
+
+def _format_amount(value):
+    """Montant sans décimales, espaces comme séparateurs de milliers"""
+    return f"{int(float(value)):,}".replace(',', ' ')
+
+
+def number_to_words_french(num):
+    """Convertit un nombre en lettres françaises"""
+    if num == 0:
+        return "ZÉRO"
+    
+    units = ["", "UN", "DEUX", "TROIS", "QUATRE", "CINQ", "SIX", "SEPT", "HUIT", "NEUF",
+             "DIX", "ONZE", "DOUZE", "TREIZE", "QUATORZE", "QUINZE", "SEIZE", "DIX-SEPT",
+             "DIX-HUIT", "DIX-NEUF"]
+    
+    def convert_0_19(n):
+        """Convertit les nombres de 0 à 19"""
+        if n == 0:
+            return ""
+        return units[n]
+    
+    def convert_20_99(n):
+        """Convertit les nombres de 20 à 99"""
+        if n < 20:
+            return convert_0_19(n)
+        
+        tens_digit = n // 10
+        units_digit = n % 10
+        
+        if tens_digit == 2:  # 20-29
+            if units_digit == 0:
+                return "VINGT"
+            elif units_digit == 1:
+                return "VINGT-ET-UN"
+            else:
+                return "VINGT-" + convert_0_19(units_digit)
+        elif tens_digit == 3:  # 30-39
+            if units_digit == 0:
+                return "TRENTE"
+            elif units_digit == 1:
+                return "TRENTE-ET-UN"
+            else:
+                return "TRENTE-" + convert_0_19(units_digit)
+        elif tens_digit == 4:  # 40-49
+            if units_digit == 0:
+                return "QUARANTE"
+            elif units_digit == 1:
+                return "QUARANTE-ET-UN"
+            else:
+                return "QUARANTE-" + convert_0_19(units_digit)
+        elif tens_digit == 5:  # 50-59
+            if units_digit == 0:
+                return "CINQUANTE"
+            elif units_digit == 1:
+                return "CINQUANTE-ET-UN"
+            else:
+                return "CINQUANTE-" + convert_0_19(units_digit)
+        elif tens_digit == 6:  # 60-69
+            if units_digit == 0:
+                return "SOIXANTE"
+            elif units_digit == 1:
+                return "SOIXANTE-ET-UN"
+            else:
+                return "SOIXANTE-" + convert_0_19(units_digit)
+        elif tens_digit == 7:  # 70-79
+            remainder = n - 60
+            if remainder == 0:
+                return "SOIXANTE-DIX"
+            elif remainder == 1:
+                return "SOIXANTE-ET-ONZE"
+            else:
+                return "SOIXANTE-" + convert_0_19(remainder)
+        elif tens_digit == 8:  # 80-89
+            if units_digit == 0:
+                return "QUATRE-VINGTS"
+            else:
+                remainder = n - 80
+                if remainder == 0:
+                    return "QUATRE-VINGTS"
+                elif remainder == 1:
+                    return "QUATRE-VINGT-UN"
+                else:
+                    return "QUATRE-VINGT-" + convert_0_19(remainder)
+        elif tens_digit == 9:  # 90-99
+            remainder = n - 80
+            if remainder == 0:
+                return "QUATRE-VINGT-DIX"
+            elif remainder == 1:
+                return "QUATRE-VINGT-ONZE"
+            else:
+                return "QUATRE-VINGT-" + convert_0_19(remainder)
+        
+        return ""
+    
+    def convert_100_999(n):
+        """Convertit les nombres de 100 à 999"""
+        if n < 100:
+            return convert_20_99(n)
+        
+        hundreds_digit = n // 100
+        remainder = n % 100
+        
+        if hundreds_digit == 1:
+            if remainder == 0:
+                return "CENT"
+            else:
+                return "CENT-" + convert_20_99(remainder)
+        else:
+            if remainder == 0:
+                return units[hundreds_digit] + "-CENTS"
+            else:
+                return units[hundreds_digit] + "-CENT-" + convert_20_99(remainder)
+    
+    def convert_1000_999999(n):
+        """Convertit les nombres de 1000 à 999999"""
+        if n < 1000:
+            return convert_100_999(n)
+        
+        thousands = n // 1000
+        remainder = n % 1000
+        
+        if thousands == 1:
+            if remainder == 0:
+                return "MILLE"
+            else:
+                return "MILLE-" + convert_100_999(remainder)
+        else:
+            thousands_text = convert_100_999(thousands)
+            if remainder == 0:
+                return thousands_text + "-MILLE"
+            else:
+                return thousands_text + "-MILLE-" + convert_100_999(remainder)
+    
+    # Convertir en entier
+    integer_part = int(num)
+    
+    if integer_part == 0:
+        return "ZÉRO"
+    elif integer_part < 20:
+        return convert_0_19(integer_part)
+    elif integer_part < 100:
+        return convert_20_99(integer_part)
+    elif integer_part < 1000:
+        return convert_100_999(integer_part)
+    elif integer_part < 1000000:
+        return convert_1000_999999(integer_part)
+    else:
+        # Pour les nombres très grands, on peut les diviser
+        millions = integer_part // 1000000
+        remainder = integer_part % 1000000
+        
+        if millions == 1:
+            if remainder == 0:
+                return "UN-MILLION"
+            else:
+                return "UN-MILLION-" + convert_1000_999999(remainder)
+        else:
+            millions_text = convert_1000_999999(millions)
+            if remainder == 0:
+                return millions_text + "-MILLIONS"
+            else:
+                return millions_text + "-MILLIONS-" + convert_1000_999999(remainder)
+
+
+class InvoiceRenderEngine:
+    """
+    Rendu PDF des factures. Tout ce qui ne dépend pas de la facture (styles, logo
+    décodé, en-tête de l'entreprise, styles des tableaux) est préparé une fois à la
+    création ; render() ne construit que la ligne client/date, le tableau des articles
+    et le montant en lettres.
+
+    Les flowables partagés sont recalculés par reportlab pendant la mise en page : un
+    verrou sérialise les rendus d'un même processus.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
+        company_name_style = ParagraphStyle(
+            'CompanyName', parent=self.normal_style, fontSize=24, fontName='Helvetica-Bold',
+            textColor=colors.black, alignment=TA_CENTER, spaceAfter=6,
+        )
+        company_info_style = ParagraphStyle(
+            'CompanyInfo', parent=self.normal_style, fontSize=10, fontName='Helvetica',
+            textColor=colors.black, alignment=TA_CENTER, spaceAfter=3,
+        )
+        invoice_title_style = ParagraphStyle(
+            'InvoiceTitle', parent=self.normal_style, fontSize=16, fontName='Helvetica-Bold',
+            textColor=colors.black, alignment=TA_CENTER, spaceAfter=20,
+        )
+        self.amount_style = ParagraphStyle(
+            'AmountInWords', parent=self.normal_style, fontSize=10, fontName='Helvetica',
+            textColor=colors.black, alignment=TA_LEFT, spaceAfter=0,
+        )
+        signature_style = ParagraphStyle(
+            'Signature', parent=self.normal_style, fontSize=10, fontName='Helvetica',
+            textColor=colors.black, alignment=TA_RIGHT, spaceAfter=0,
+        )
+
+        self.client_date_style = TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            *FLAT_TABLE_COMMANDS,
+        ])
+        self.items_style = TableStyle(ITEMS_TABLE_COMMANDS)
+
+        # En-tête: Logo à gauche, nom de l'entreprise centré
+        logo = self._load_logo()
+        if logo:
+            header_table = Table(
+                [[logo, Paragraph(COMPANY_NAME, company_name_style), '']], colWidths=[4*cm, 9*cm, 4*cm]
+            )
+            header_table.setStyle(TableStyle([
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+                ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+                ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+                *FLAT_TABLE_COMMANDS,
+            ]))
+            self.header = [header_table]
+        else:
+            self.header = [Paragraph(COMPANY_NAME, company_name_style)]
+        self.header.append(Spacer(1, 0.3*cm))
+        self.header += [Paragraph(info, company_info_style) for info in COMPANY_INFO]
+        self.header.append(Spacer(1, 0.5*cm))
+
+        self.title = [
+            Spacer(1, 0.3*cm),
+            Paragraph("<u>FACTURE</u>", invoice_title_style),
+            Spacer(1, 1.5*cm),  # Plus d'espace après FACTURE avant le tableau
+        ]
+        self.footer = [Spacer(1, 2*cm), Paragraph("Le responsable", signature_style)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_logo():
+        """
+        Premier logo lisible, réduit une fois à LOGO_DPI pour sa taille d'affichage : le
+        fichier d'origine (bien plus grand) serait réencodé dans chaque PDF. Un nouveau
+        logo est pris en compte au redémarrage.
+        """
+        for logo_path in LOGO_PATHS:
+            if os.path.exists(logo_path):
+                try:
+                    with PILImage.open(logo_path) as source:
+                        pixels = round(LOGO_SIZE / inch * LOGO_DPI)
+                        image_format = 'JPEG' if source.format == 'JPEG' else 'PNG'
+                        if max(source.size) > pixels:
+                            source.thumbnail((pixels, pixels), PILImage.LANCZOS)
+                        buffer = io.BytesIO()
+                        source.save(buffer, image_format, **({'quality': 90} if image_format == 'JPEG' else {}))
+                    buffer.seek(0)
+                    return Image(buffer, width=LOGO_SIZE, height=LOGO_SIZE, lazy=0)
+                except Exception as e:
+                    logger.warning("Erreur lors du chargement du logo %s : %s", logo_path, e)
+        return None
+
+    def render(self, invoice, output):
+        """Écrit le PDF de la facture dans `output` (réponse HTTP ou fichier binaire)"""
+        return self._build(self._story(invoice), output)
+
+    def _story(self, invoice):
+        client_name = invoice.customer.full_name if invoice.customer else "Non spécifié"
+        client_date_table = Table([[
+            Paragraph(f"<u>Client :</u> {client_name}", self.normal_style),
+            Paragraph(f"Bobo Dioulasso , le {invoice.date.strftime('%d/%m/%Y')}", self.normal_style),
+        ]], colWidths=[10*cm, 7*cm])
+        client_date_table.setStyle(self.client_date_style)
+
+        items_data = [['Désignation', 'Quantité', 'Prix unitaire', 'Prix total']]
+        for item in invoice.items.all():
+            items_data.append([
+                item.description, str(item.quantity), _format_amount(item.unit_price), _format_amount(item.subtotal)
+            ])
+        total_amount = int(float(invoice.total_amount))
+        total_formatted = _format_amount(total_amount)
+        # Ligne TOTAL GENERAL directement dans le tableau des items
+        items_data.append(['TOTAL GENERAL', '', '', total_formatted])
+        items_table = Table(items_data, colWidths=[8*cm, 3*cm, 3*cm, 3*cm])
+        items_table.setStyle(self.items_style)
+
+        amount_text = (
+            f"Arrêté la présente facture à la somme de : {number_to_words_french(total_amount)} "
+            f"({total_formatted}) Francs CFA."
+        )
+        return [
+            *self.header,
+            client_date_table,
+            *self.title,
+            items_table,
+            Spacer(1, 0.5*cm),
+            Paragraph(amount_text, self.amount_style),
+            *self.footer,
+        ]
+
+    def _build(self, story, output):
+        doc = SimpleDocTemplate(
+            output, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm
+        )
+        with self._lock, _binary_streams():
+            doc.build(story)
+        return output
+
+
+@contextmanager
+def _binary_streams():
+    """
+    Flux binaires dans les PDF de ce moteur : sans l'accélérateur C de reportlab,
+    l'encodage ASCII85 (en Python pur) du logo coûtait plus que tout le reste du rendu.
+    reportlab ne lit ce réglage que dans sa configuration globale : il n'est modifié
+    que le temps de la construction, puis restauré.
+    """
+    previous = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_render_engine():
+    """Moteur de rendu du processus, créé au premier PDF"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = InvoiceRenderEngine()
+    return _engine
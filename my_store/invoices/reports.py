@@ -0,0 +1,50 @@
+from my_store.exports import Report
+from my_store.streaming import STREAM_CHUNK_SIZE
+from .models import Invoice
+
+
+def filter_invoices(queryset, params):
+    """Filtres de la liste des factures (customer, date_from, date_to)"""
+    customer = params.get('customer', None)
+    date_from = params.get('date_from', None)
+    date_to = params.get('date_to', None)
+
+    if customer:
+        queryset = queryset.filter(customer_id=customer)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+
+    return queryset
+
+
+def invoices_report(params):
+    """Rapport des factures pour les filtres de la liste"""
+    date_from = params.get('date_from') or None
+    date_to = params.get('date_to') or None
+    return Report(
+        f"rapport_factures_{date_from or 'all'}_{date_to or 'all'}",
+        "Rapport des Factures",
+        ['Date', 'Numéro', 'Client', 'Commande', 'Sous-total', 'Total'],
+        [12, 18, 30, 18, 12, 12],
+        _invoice_report_lines(filter_invoices(Invoice.objects.all(), params).order_by('date', 'id')),
+        5,
+    )
+
+
+def _invoice_report_lines(queryset):
+    """Lignes du rapport des factures (valeurs, total), clients et commandes joints, lues par paquets"""
+    rows = queryset.values_list(
+        'date', 'invoice_number', 'customer__first_name', 'customer__last_name',
+        'order__order_number', 'subtotal', 'total_amount'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    for date, invoice_number, first_name, last_name, order_number, subtotal, total_amount in rows:
+        yield [
+            date.strftime('%d/%m/%Y'),
+            invoice_number,
+            f"{first_name} {last_name}".strip(),
+            order_number or '-',
+            subtotal,
+            total_amount,
+        ], total_amount
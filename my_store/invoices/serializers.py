@@ -1,4 +1,9 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from core.numbering import next_number
 from .models import Invoice, InvoiceItem
 from customers.serializers import CustomerSerializer
 
@@ -49,36 +54,29 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items')
         
         # Générer la date si elle n'est pas fournie
-        from django.utils import timezone
-        
         if 'date' not in validated_data:
             validated_data['date'] = timezone.now().date()
         
-        invoice = Invoice.objects.create(**validated_data)
-        
-        # Generate invoice number
-        import random
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = random.randint(1000, 9999)
-        invoice_number = f"INV-{timestamp}-{random_suffix}"
-        
-        # Ensure uniqueness
-        while Invoice.objects.filter(invoice_number=invoice_number).exists():
-            random_suffix = random.randint(1000, 9999)
-            invoice_number = f"INV-{timestamp}-{random_suffix}"
-        
-        invoice.invoice_number = invoice_number
-        
-        # Create invoice items
-        for item_data in items_data:
-            InvoiceItem.objects.create(
-                invoice=invoice,
+        # Totaux calculés en mémoire : la facture est insérée une seule fois, déjà complète
+        items = [
+            InvoiceItem(
                 description=item_data['description'],
                 quantity=item_data['quantity'],
                 unit_price=item_data['unit_price']
             )
+            for item_data in items_data
+        ]
+        subtotal = sum((item.subtotal for item in items), Decimal('0.00'))
         
-        invoice.calculate_totals()
+        with transaction.atomic():
+            invoice = Invoice.objects.create(
+                # Séquence de l'année de la facture, même si elle est antidatée
+                invoice_number=next_number('INV', year=validated_data['date'].year),
+                subtotal=subtotal, total_amount=subtotal, **validated_data
+            )
+            for item in items:
+                item.invoice = invoice
+            InvoiceItem.objects.bulk_create(items)
         
         return invoice
 
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import zipfile
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.models import User
+from customers.models import Customer
+from core.jobs import claim_next_job, run_job
+from .bulk import write_bulk_pdfs
+from .models import Invoice, InvoiceItem
+from .rendering import InvoiceRenderEngine
+
+
+class InvoiceExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        for number, day, total in (('F-2', date(2025, 3, 2), '1500.00'), ('F-1', date(2025, 3, 1), '2500.50')):
+            Invoice.objects.create(
+                invoice_number=number, customer=customer, date=day,
+                subtotal=Decimal(total), total_amount=Decimal(total)
+            )
+
+    def test_csv_export(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/invoices/export_report/', {'format': 'csv', 'date_from': '2025-03-01'})
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('rapport_factures_2025-03-01_all.csv', response['Content-Disposition'])
+        self.assertEqual(content.lstrip('\ufeff').splitlines(), [
+            'Date;Numéro;Client;Commande;Sous-total;Total',
+            '01/03/2025;F-1;Awa Traoré;-;2500.50;2500.50',
+            '02/03/2025;F-2;Awa Traoré;-;1500.00;1500.00',
+            '',
+            'TOTAL GÉNÉRAL;;;;;4000.50',
+        ])
+
+    def test_xlsx_export(self):
+        response = self.client.get('/api/invoices/export_report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('rapport_factures_all_all.xlsx', response['Content-Disposition'])
+
+
+class InvoiceCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+
+    def test_create_inserts_numbered_invoice_with_totals(self):
+        payload = {
+            'customer': self.customer.id,
+            'date': '2025-03-01',
+            'items': [
+                {'description': 'Radio', 'quantity': 2, 'unit_price': '2500.00'},
+                {'description': 'Lampe', 'quantity': 1, 'unit_price': '1000.50'},
+            ],
+        }
+        response = self.client.post('/api/invoices/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        invoice = Invoice.objects.get()
+        self.assertEqual(invoice.invoice_number, 'INV-2025-000001')
+        self.assertEqual(invoice.subtotal, Decimal('6000.50'))
+        self.assertEqual(invoice.total_amount, Decimal('6000.50'))
+        self.assertEqual(list(invoice.items.values_list('description', flat=True)), ['Radio', 'Lampe'])
+
+    def test_back_dated_invoice_uses_its_own_year_sequence(self):
+        payload = {'customer': self.customer.id, 'items': [{'description': 'Radio', 'quantity': 1, 'unit_price': '2500.00'}]}
+        self.client.post('/api/invoices/', payload, format='json')
+        # Facture du 30 décembre saisie après le changement d'année
+        year = timezone.localdate().year
+        self.client.post('/api/invoices/', {**payload, 'date': f'{year - 1}-12-30'}, format='json')
+        numbers = list(Invoice.objects.order_by('id').values_list('invoice_number', flat=True))
+        self.assertEqual(numbers, [f'INV-{year}-000001', f'INV-{year - 1}-000001'])
+
+
+class InvoicePdfCacheTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.pdf_dir = os.path.join(media_root, 'invoices', 'pdf')
+
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        self.invoice = Invoice.objects.create(
+            invoice_number='F-1', customer=customer, date=date(2025, 3, 1),
+            subtotal=Decimal('5000.00'), total_amount=Decimal('5000.00')
+        )
+        self.item = InvoiceItem.objects.create(
+            invoice=self.invoice, description='Radio', quantity=2, unit_price=Decimal('2500.00')
+        )
+        self.url = f'/api/invoices/{self.invoice.id}/download_pdf/'
+        self.render = mock.patch.object(
+            InvoiceRenderEngine, 'render', autospec=True, side_effect=InvoiceRenderEngine.render
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _get(self, url=None, **headers):
+        response = self.client.get(url or self.url, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_engine_writes_binary_streams_without_changing_reportlab_config(self):
+        from reportlab import rl_config
+        
+        previous = rl_config.useA85
+        _, pdf = self._get()
+        self.assertNotIn(b'ASCII85Decode', pdf)
+        self.assertEqual(rl_config.useA85, previous)
+
+    def test_repeat_views_read_the_cached_file(self):
+        first, pdf = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertIn('attachment; filename="facture_F-1.pdf"', first['Content-Disposition'])
+        self.assertEqual(first['Accept-Ranges'], 'bytes')
+
+        with self.assertNumQueries(2):
+            preview, content = self._get(f'/api/invoices/{self.invoice.id}/preview_pdf/')
+        self.assertEqual(content, pdf)
+        self.assertTrue(preview['Content-Disposition'].startswith('inline'))
+        self.assertEqual(preview['ETag'], first['ETag'])
+        self.assertEqual(self.render.call_count, 1)
+
+        not_modified, _ = self._get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_byte_ranges(self):
+        _, pdf = self._get()
+        partial, content = self._get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(content, pdf[:10])
+        self.assertEqual(partial['Content-Range'], f'bytes 0-9/{len(pdf)}')
+
+        suffix, content = self._get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(content, pdf[-5:])
+
+        outside, _ = self._get(HTTP_RANGE=f'bytes={len(pdf)}-')
+        self.assertEqual(outside.status_code, 416)
+        self.assertEqual(outside['Content-Range'], f'bytes */{len(pdf)}')
+
+        stale, content = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"ancienne"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(content, pdf)
+
+    def test_changed_items_render_a_new_version(self):
+        first, _ = self._get()
+        self.item.quantity = 3
+        self.item.save()
+        second, _ = self._get()
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.render.call_count, 2)
+        self.assertEqual(len(os.listdir(os.path.join(self.pdf_dir, str(self.invoice.id)))), 1)
+
+    def test_deleted_invoice_discards_cached_pdf(self):
+        self._get()
+        directory = os.path.join(self.pdf_dir, str(self.invoice.id))
+        self.assertTrue(os.path.isdir(directory))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.delete()
+        self.assertFalse(os.path.exists(directory))
+
+
+class BulkInvoicePdfTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='comptable', password='secret')
+        self.client.force_authenticate(self.user)
+        awa = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        ali = Customer.objects.create(first_name='Ali', last_name='Sanou')
+        for number, customer, day in (
+            ('F-1', awa, date(2025, 3, 1)), ('F-2', ali, date(2025, 3, 2)),
+            ('F-3', awa, date(2025, 3, 3)), ('F-4', awa, date(2025, 4, 1)),
+        ):
+            invoice = Invoice.objects.create(
+                invoice_number=number, customer=customer, date=day,
+                subtotal=Decimal('2500.00'), total_amount=Decimal('2500.00')
+            )
+            InvoiceItem.objects.create(invoice=invoice, description='Radio', quantity=1, unit_price=Decimal('2500.00'))
+        self.awa = awa
+
+    def test_zip_of_filtered_invoices_in_two_queries(self):
+        output = io.BytesIO()
+        with self.assertNumQueries(2):
+            count = write_bulk_pdfs({'date_from': '2025-03-01', 'date_to': '2025-03-31'}, output, 'zip', processes=0)
+        self.assertEqual(count, 3)
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(archive.namelist(), ['facture_F-1.pdf', 'facture_F-2.pdf', 'facture_F-3.pdf'])
+            self.assertTrue(archive.read('facture_F-2.pdf').startswith(b'%PDF'))
+
+    def test_merged_pdf_has_one_page_per_invoice(self):
+        from pypdf import PdfReader
+        from . import bulk
+        
+        output = io.BytesIO()
+        # Factures rendues comme pour le ZIP (pool au-delà du seuil), puis pages assemblées
+        with mock.patch.object(bulk, 'render_invoice_pdfs', wraps=bulk.render_invoice_pdfs) as render:
+            with self.assertNumQueries(2):
+                count = write_bulk_pdfs({'customer': self.awa.id}, output, 'pdf', processes=0)
+        self.assertEqual(count, 3)
+        self.assertEqual(render.call_args.kwargs['processes'], 0)
+        pages = PdfReader(output).pages
+        self.assertEqual(len(pages), 3)
+        self.assertIn('le 01/04/2025', pages[2].extract_text())
+
+    def test_endpoint_enqueues_job(self):
+        response = self.client.post('/api/invoices/bulk_pdf/', {'format': 'pdf', 'date_to': '2025-03-31'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['kind'], 'invoice_pdf_bulk')
+        self.assertEqual(run_job(claim_next_job()), 'succeeded')
+
+        job = self.client.get(f"/api/jobs/{response.json()['id']}/").json()
+        self.assertEqual(job['result'], {'invoices': 3})
+        download = self.client.get(f"/api/jobs/{job['id']}/download/")
+        self.assertIn('factures_all_2025-03-31.pdf', download['Content-Disposition'])
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.post('/api/invoices/bulk_pdf/', {'format': 'docx'}, format='json')
+        self.assertEqual(response.status_code, 400)
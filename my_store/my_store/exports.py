@@ -0,0 +1,183 @@
+import csv
+import tempfile
+from decimal import Decimal
+
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+# Séparateur attendu par Excel en français
+CSV_DELIMITER = ';'
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+TOTAL_FONT = Font(bold=True)
+TOTAL_ALIGNMENT = Alignment(horizontal="right", vertical="center")
+
+
+def write_only_sheet(workbook, title, column_widths):
+    """
+    Crée une feuille en mode écriture seule (les lignes partent sur disque au fur et
+    à mesure) ; les largeurs de colonnes doivent être fixées avant la première ligne.
+    """
+    ws = workbook.create_sheet(title)
+    for index, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+    return ws
+
+
+def styled_row(ws, values, font=None, fill=None, alignment=None):
+    """Ligne de cellules mises en forme, pour les feuilles en écriture seule"""
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        if alignment:
+            cell.alignment = alignment
+        cells.append(cell)
+    return cells
+
+
+def header_row(ws, headers, color="366092"):
+    fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+    return styled_row(ws, headers, font=HEADER_FONT, fill=fill, alignment=HEADER_ALIGNMENT)
+
+
+def total_row(ws, values):
+    return styled_row(ws, xlsx_values(values), font=TOTAL_FONT, alignment=TOTAL_ALIGNMENT)
+
+
+def xlsx_values(values):
+    """Les montants Decimal sont écrits comme nombres dans les classeurs"""
+    return [float(value) if isinstance(value, Decimal) else value for value in values]
+
+
+def new_write_only_workbook():
+    return Workbook(write_only=True)
+
+
+def xlsx_file_response(workbook, filename):
+    """
+    Enregistre le classeur dans un fichier temporaire et l'envoie par blocs ;
+    le fichier est supprimé à la fermeture de la réponse.
+    """
+    handle = tempfile.TemporaryFile()
+    workbook.save(handle)
+    handle.seek(0)
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class CSVRenderer(BaseRenderer):
+    """Rendu CSV, sélectionné avec ?format=csv (les exports l'écrivent eux-mêmes en flux)"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        echo = _Echo()
+        writer = csv.writer(echo, delimiter=CSV_DELIMITER)
+        if not records or not isinstance(records[0], dict):
+            return ''.join(writer.writerow([record]) for record in records).encode('utf-8')
+        headers = list(records[0].keys())
+        lines = [writer.writerow(headers)]
+        lines += [writer.writerow([record.get(header) for header in headers]) for record in records]
+        return ''.join(lines).encode('utf-8')
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie directement la ligne écrite"""
+    def write(self, value):
+        return value
+
+
+def wants_csv(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == 'csv'
+
+
+class Report:
+    """
+    Rapport tabulaire : en-têtes, lignes (valeurs, montant) lues en flux depuis la base,
+    puis une ligne « TOTAL GÉNÉRAL » avec la somme des montants dans la colonne `total_index`.
+    Le même rapport peut être envoyé en réponse HTTP (XLSX ou CSV) ou écrit dans un
+    fichier par un job d'arrière-plan.
+    """
+    header_color = "366092"
+
+    def __init__(self, filename, title, headers, column_widths, lines, total_index):
+        self.filename = filename
+        self.title = title
+        self.headers = headers
+        self.column_widths = column_widths
+        self.lines = lines
+        self.total_index = total_index
+        self.row_count = 0
+
+    def footer(self, total):
+        footer = [''] * len(self.headers)
+        footer[0] = 'TOTAL GÉNÉRAL'
+        footer[self.total_index] = self.grand_total(total)
+        return footer
+
+    def grand_total(self, running_total):
+        """Total du pied de rapport ; par défaut la somme des lignes écrites"""
+        return running_total
+
+    def extra_sheets(self, workbook):
+        """Feuilles ajoutées après le détail dans le classeur (aucune par défaut)"""
+
+    def csv_chunks(self):
+        writer = csv.writer(_Echo(), delimiter=CSV_DELIMITER)
+        # BOM pour qu'Excel détecte l'UTF-8
+        yield '\ufeff' + writer.writerow(self.headers)
+        total = Decimal('0')
+        for values, amount in self.lines:
+            total += amount
+            self.row_count += 1
+            yield writer.writerow(values)
+        yield writer.writerow([])
+        yield writer.writerow(self.footer(total))
+
+    def workbook(self):
+        """Classeur en écriture seule : les lignes ne restent pas en mémoire"""
+        wb = new_write_only_workbook()
+        ws = write_only_sheet(wb, self.title, self.column_widths)
+        ws.append(header_row(ws, self.headers, self.header_color))
+        total = Decimal('0')
+        for values, amount in self.lines:
+            ws.append(xlsx_values(values))
+            total += amount
+            self.row_count += 1
+        ws.append([])
+        ws.append(total_row(ws, self.footer(total)))
+        self.extra_sheets(wb)
+        return wb
+
+    def response(self, request):
+        """CSV en flux avec ?format=csv, sinon classeur XLSX envoyé depuis un fichier temporaire"""
+        if wants_csv(request):
+            response = StreamingHttpResponse(self.csv_chunks(), content_type=CSV_CONTENT_TYPE)
+            response['Content-Disposition'] = f'attachment; filename="{self.filename}.csv"'
+            return response
+        return xlsx_file_response(self.workbook(), f"{self.filename}.xlsx")
+
+    def save(self, handle, file_format='xlsx'):
+        """Écrit le rapport dans un fichier binaire ouvert ; retourne l'extension utilisée"""
+        if file_format == 'csv':
+            for chunk in self.csv_chunks():
+                handle.write(chunk.encode('utf-8'))
+            return 'csv'
+        self.workbook().save(handle)
+        return 'xlsx'
@@ -0,0 +1,73 @@
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _byte_range(header, size):
+    """
+    Plage demandée par l'en-tête Range -> (début, fin incluse), None si l'en-tête est
+    ignoré (absent, plusieurs plages, syntaxe inconnue) ou False si elle est hors du fichier.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # « bytes=-N » : les N derniers octets
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(request, path, filename, content_type, etag, as_attachment=True):
+    """
+    Envoie un fichier déjà généré avec validation par ETag (304 si le client a déjà
+    cette version) et prise en charge d'une plage d'octets (206 / 416).
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        response = HttpResponse(status=304)
+    else:
+        size = os.path.getsize(path)
+        if_range = request.headers.get('If-Range')
+        byte_range = _byte_range(request.headers.get('Range'), size) if not if_range or if_range == etag else None
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        else:
+            response = FileResponse(
+                open(path, 'rb'), as_attachment=as_attachment, filename=filename, content_type=content_type
+            )
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) activée à la demande.
+
+    Sans paramètre `cursor` ni `page_size`, les listes restent renvoyées en entier
+    pour ne pas casser les clients existants. L'ordre utilisé est celui du Meta du
+    modèle (`-sale_date`, `-date`, `-created_at`, `-expense_date`...), complété par
+    la clé primaire pour départager les égalités.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(queryset.model._meta.ordering or ['-pk'])
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return tuple(ordering)
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
     'sales',
     'expenses',
     'invoices',
+    'core',
 ]
 
 MIDDLEWARE = [
@@ -145,8 +148,42 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # Pagination par curseur, activée uniquement avec ?cursor= ou ?page_size=
+    'DEFAULT_PAGINATION_CLASS': 'my_store.pagination.OptionalCursorPagination',
+}
+
+# Cache des réponses en lecture (listes, statistiques du tableau de bord).
+# Les réponses restent en mémoire locale (chaque processus a les siennes) ; les
+# compteurs de version qui les invalident sont dans la table core.ModelVersion : une
+# écriture dans un worker invalide les réponses de tous les workers. Pour plusieurs
+# machines, un backend partagé (Redis, Memcached) évite de recalculer par processus.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'my_store',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
 }
 
+# Modèles dont les écritures invalident les réponses en cache (compteur de version par modèle)
+RESPONSE_CACHE_MODELS = (
+    'products.Product',
+    'products.Category',
+    'customers.Customer',
+    'invoices.Invoice',
+    'sales.DailySalesSummary',
+    'expenses.DailyExpenseSummary',
+    'expenses.ExpenseCategory',
+)
+
+# Durée de réservation du stock après une vérification de panier (check_stock avec reserve=true)
+STOCK_RESERVATION_TTL = timedelta(minutes=5)
+
+# Numéros de documents réservés par blocs (préfixe -> taille) : moins d'écritures sur le
+# compteur, mais des trous possibles. Les factures restent numérotées une à une, sans trou.
+DOCUMENT_NUMBER_BLOCK_SIZES = {}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -160,3 +197,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# En-tête utilisé pour rejouer sans risque les créations (ventes, commandes, factures)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match')
+# Validateurs des GET conditionnels, lisibles par le client React
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
@@ -0,0 +1,60 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Taille des paquets lus côté serveur lors d'un export en flux
+STREAM_CHUNK_SIZE = 500
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Rendu NDJSON (un objet JSON par ligne), sélectionné avec ?format=ndjson"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return ''.join(_dumps(record) + '\n' for record in records).encode('utf-8')
+
+
+def _dumps(record):
+    return json.dumps(record, cls=JSONEncoder, ensure_ascii=False)
+
+
+def streaming_mode(request):
+    """Retourne 'ndjson', 'json' ou None selon le mode de flux demandé"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format == 'ndjson':
+        return 'ndjson'
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return 'json'
+    return None
+
+
+def streaming_response(records, mode):
+    """
+    Envoie les enregistrements au fur et à mesure qu'ils sont produits,
+    sans construire la liste complète en mémoire.
+    """
+    if mode == 'ndjson':
+        content = (_dumps(record) + '\n' for record in records)
+        content_type = NDJSONRenderer.media_type
+    else:
+        content = _json_array(records)
+        content_type = 'application/json'
+    response = StreamingHttpResponse(content, content_type=f'{content_type}; charset=utf-8')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _json_array(records):
+    yield '['
+    first = True
+    for record in records:
+        yield _dumps(record) if first else ',' + _dumps(record)
+        first = False
+    yield ']'
@@ -31,6 +31,7 @@ urlpatterns = [
     path('api/', include('sales.urls')),
     path('api/', include('expenses.urls')),
     path('api/', include('invoices.urls')),
+    path('api/', include('core.urls')),
 ]
 
 # Serve media files in development
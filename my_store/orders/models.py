@@ -33,6 +33,7 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
 
 class OrderItem(models.Model):
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
+from django.db import transaction
 from rest_framework import serializers
+from core.numbering import next_number
 from .models import Order, OrderItem
 from products.serializers import ProductSerializer
 from customers.serializers import CustomerSerializer
@@ -39,38 +43,22 @@ class OrderCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         
-        # Generate unique order number
-        from django.utils import timezone
-        import random
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = random.randint(1000, 9999)
-        order_number = f"ORD-{timestamp}-{random_suffix}"
-        
-        # Ensure uniqueness
-        while Order.objects.filter(order_number=order_number).exists():
-            random_suffix = random.randint(1000, 9999)
-            order_number = f"ORD-{timestamp}-{random_suffix}"
-        
-        validated_data['order_number'] = order_number
-        order = Order.objects.create(**validated_data)
-        
-        # Create order items
-        total = 0
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            price = item_data.get('price', product.price)  # Use product price if not provided
-            
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=price
+        # Lignes et total préparés en mémoire, puis une insertion de la commande et une des lignes
+        items = [
+            OrderItem(
+                product=item_data['product'],
+                quantity=item_data['quantity'],
+                price=item_data.get('price', item_data['product'].price)  # Prix du produit si non fourni
             )
-            total += quantity * price
+            for item_data in items_data
+        ]
+        total = sum((item.subtotal for item in items), Decimal('0.00'))
         
-        order.total_amount = total
-        order.save()
+        with transaction.atomic():
+            order = Order.objects.create(order_number=next_number('ORD'), total_amount=total, **validated_data)
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
         
         return order
 
@@ -1,3 +1,60 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.models import User
+from customers.models import Customer
+from products.models import Product
+from .models import Order, OrderItem
+
+
+class OrderWriteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='vendeur', password='secret')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=10)
+
+    def test_create_inserts_order_with_number_and_total(self):
+        response = self.client.post('/api/orders/', {
+            'customer': self.customer.id,
+            'items': [
+                {'product': self.radio.id, 'quantity': 2},
+                {'product': self.lampe.id, 'quantity': 3, 'price': '900.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.order_number, f'ORD-{timezone.localdate().year}-000001')
+        self.assertEqual(order.total_amount, Decimal('7700.00'))
+        self.assertEqual(
+            list(order.items.values_list('product__name', 'quantity', 'price')),
+            [('Radio', 2, Decimal('2500.00')), ('Lampe', 3, Decimal('900.00'))],
+        )
+
+    def test_add_item_increments_total(self):
+        order = Order.objects.create(customer=self.customer, order_number='ORD-1', total_amount=Decimal('2500.00'))
+        OrderItem.objects.create(order=order, product=self.radio, quantity=1, price=Decimal('2500.00'))
+        updated_at = order.updated_at
+
+        response = self.client.post(
+            f'/api/orders/{order.id}/add_item/', {'product': self.lampe.id, 'quantity': 2, 'price': '1000.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['total_amount']), Decimal('4500.00'))
+        self.assertEqual(len(response.json()['items']), 2)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('4500.00'))
+        self.assertGreater(order.updated_at, updated_at)
+
+    def test_add_item_rejects_invalid_quantity(self):
+        order = Order.objects.create(customer=self.customer, order_number='ORD-1')
+        response = self.client.post(
+            f'/api/orders/{order.id}/add_item/', {'product': self.lampe.id, 'quantity': 'deux', 'price': '1000.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(order.items.exists())
@@ -2,18 +2,28 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Q
+from rest_framework.settings import api_settings
+from django.db import transaction
+from django.db.models import F, Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from core.conditional import ConditionalGetMixin
+from core.idempotency import IdempotentCreateMixin
+from my_store.exports import CSVRenderer
 from .models import Order, OrderItem
+from .reports import filter_orders, orders_report
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderListSerializer, OrderItemSerializer
 )
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentCreateMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
+    # Nom du client et des produits affichés par les serializers
+    etag_models = ('customers.Customer', 'products.Product')
     permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -23,22 +33,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
 
     def get_queryset(self):
-        queryset = Order.objects.all()
-        status_filter = self.request.query_params.get('status', None)
-        customer = self.request.query_params.get('customer', None)
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        if customer:
-            queryset = queryset.filter(customer_id=customer)
-        if date_from:
-            queryset = queryset.filter(created_at__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created_at__lte=date_to)
-
-        return queryset
+        return filter_orders(Order.objects.all(), self.request.query_params)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -81,14 +76,29 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=price
-        )
+        try:
+            quantity = int(quantity)
+            price = Decimal(str(price))
+        except (ValueError, TypeError, InvalidOperation):
+            return Response(
+                {'error': 'Quantité ou prix invalide'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        order.calculate_total()
+        # Le total est augmenté du sous-total de la ligne, sans relire toutes les lignes
+        item = OrderItem(order=order, product=product, quantity=quantity, price=price)
+        now = timezone.now()
+        with transaction.atomic():
+            item.save()
+            Order.objects.filter(pk=order.pk).update(
+                total_amount=F('total_amount') + item.subtotal, updated_at=now
+            )
+        order.total_amount += item.subtotal
+        order.updated_at = now
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def export_report(self, request):
+        """Rapport des commandes (Excel, ou CSV avec ?format=csv) pour les filtres de la liste"""
+        return orders_report(request.query_params).response(request)
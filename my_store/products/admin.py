@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Product, Category
+from django.db import transaction
+from .ledger import locked_stock, record_stock_movements
+from .models import Product, Category, StockMovement, StockSnapshot
 
 
 @admin.register(Category)
@@ -14,3 +16,33 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'category', 'created_at']
     search_fields = ['name', 'description']
     readonly_fields = ['created_at', 'updated_at']
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            previous_stock = 0
+            if change:
+                # Valeur verrouillée plutôt que celle affichée dans le formulaire : une vente
+                # validée depuis n'est ni écrasée ni comptée dans l'ajustement
+                previous_stock = locked_stock(obj.pk)
+                if 'stock' not in form.changed_data:
+                    obj.stock = previous_stock
+            super().save_model(request, obj, form, change)
+            record_stock_movements(
+                [(obj.id, obj.stock - previous_stock, 'adjustment' if change else 'initial', 'admin')],
+                user=request.user
+            )
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'delta', 'reason', 'reference', 'created_by', 'created_at']
+    list_filter = ['reason', 'created_at']
+    search_fields = ['product__name', 'reference']
+    readonly_fields = ['product', 'delta', 'reason', 'reference', 'created_by', 'created_at']
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['product', 'stock', 'taken_at']
+    list_filter = ['taken_at']
+    search_fields = ['product__name']
@@ -0,0 +1,124 @@
+from django.db import transaction
+from openpyxl import load_workbook
+from .ledger import record_stock_movements
+from .models import Product
+
+# Fréquence (en lignes) des mises à jour de progression d'un import
+PROGRESS_EVERY = 200
+
+
+class ImportFileError(ValueError):
+    """Fichier Excel illisible ou sans les colonnes attendues"""
+
+
+def import_products_workbook(source, filename, user, progress=None):
+    """
+    Importe des produits depuis un fichier Excel contenant les colonnes 'designation'
+    et 'quantite' : crée les produits absents et remplace le stock des autres.
+    `progress(pourcentage)` est appelé régulièrement pendant le traitement.
+    Retourne {'created', 'updated', 'errors'}.
+    """
+    # Charger le workbook
+    workbook = load_workbook(source, data_only=True)
+    sheet = workbook.active
+    
+    # Trouver les colonnes 'designation' et 'quantite'
+    header_row = None
+    designation_col = None
+    quantite_col = None
+    
+    # Chercher la ligne d'en-tête (premières 10 lignes)
+    for row_idx in range(1, min(11, sheet.max_row + 1)):
+        for col_idx in range(1, sheet.max_column + 1):
+            cell_value = sheet.cell(row=row_idx, column=col_idx).value
+            if cell_value:
+                cell_str = str(cell_value).strip().lower()
+                if 'designation' in cell_str or 'désignation' in cell_str:
+                    designation_col = col_idx
+                    header_row = row_idx
+                if 'quantite' in cell_str or 'quantité' in cell_str or 'qte' in cell_str:
+                    quantite_col = col_idx
+                    header_row = row_idx
+    
+    if not designation_col or not quantite_col:
+        raise ImportFileError('Colonnes "designation" et "quantite" non trouvées dans le fichier Excel')
+
+    # Traiter les lignes de données
+    created_count = 0
+    updated_count = 0
+    errors = []
+    
+    start_row = header_row + 1 if header_row else 2
+    reference = f"Import {filename}"[:100]
+    rows = []
+    for row_idx in range(start_row, sheet.max_row + 1):
+        designation_cell = sheet.cell(row=row_idx, column=designation_col).value
+        quantite_cell = sheet.cell(row=row_idx, column=quantite_col).value
+        
+        # Ignorer les lignes vides
+        if not designation_cell:
+            continue
+        
+        designation = str(designation_cell).strip()
+        if not designation:
+            continue
+        
+        # Convertir la quantité en entier
+        try:
+            if quantite_cell is None:
+                quantite = 0
+            else:
+                quantite = int(float(str(quantite_cell)))
+        except (ValueError, TypeError):
+            errors.append(f"Ligne {row_idx}: Quantité invalide '{quantite_cell}'")
+            continue
+        rows.append((designation, quantite))
+    
+    # Une transaction par paquet de lignes : le verrou d'écriture n'est pas gardé pendant
+    # tout l'import et la progression est visible ; relancer l'import donne le même stock.
+    for offset in range(0, len(rows), PROGRESS_EVERY):
+        if progress:
+            progress(int(offset * 100 / len(rows)))
+        movements = []
+        with transaction.atomic():
+            for designation, quantite in rows[offset:offset + PROGRESS_EVERY]:
+                # Chercher si le produit existe déjà (par nom)
+                product, created = Product.objects.get_or_create(
+                    name=designation,
+                    defaults={
+                        'stock': quantite,
+                        'price': 0.00,  # Prix par défaut
+                        'is_active': True,
+                        'created_by': user
+                    }
+                )
+                
+                if created:
+                    movements.append((product.id, quantite, 'initial', reference))
+                    created_count += 1
+                else:
+                    # Mettre à jour le stock
+                    movements.append((product.id, quantite - product.stock, 'import', reference))
+                    product.stock = quantite
+                    product.save()
+                    updated_count += 1
+            
+            # Journaliser les mouvements du paquet en une insertion
+            record_stock_movements(movements, user=user)
+
+    return {'created': created_count, 'updated': updated_count, 'errors': errors or None}
+
+
+def run_import_job(job, context):
+    """Job `product_import` : importe le fichier envoyé avec la demande puis le supprime"""
+    from django.core.files.storage import default_storage
+    from core.jobs import delete_job_file
+
+    path = job.params['upload']
+    try:
+        with default_storage.open(path, 'rb') as source:
+            return import_products_workbook(
+                source, job.params.get('filename', path), job.created_by, progress=context.set_progress
+            )
+    finally:
+        delete_job_file(path)
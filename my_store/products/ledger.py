@@ -0,0 +1,135 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.cache import bump_model_version
+from .models import Product, StockMovement, StockSnapshot
+
+# Date de repli pour les produits sans photo de stock (tout le journal est alors pris en compte)
+LEDGER_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def record_stock_movements(movements, user=None):
+    """
+    Enregistre en une insertion les mouvements (product_id, delta, reason, reference).
+    Les mouvements nuls sont ignorés.
+    """
+    rows = [
+        StockMovement(product_id=product_id, delta=delta, reason=reason, reference=reference, created_by=user)
+        for product_id, delta, reason, reference in movements
+        if delta
+    ]
+    if rows:
+        StockMovement.objects.bulk_create(rows)
+
+
+def locked_stock(product_id):
+    """Stock actuel du produit, lu en verrouillant sa ligne (à appeler dans une transaction)"""
+    return Product.objects.select_for_update().values_list('stock', flat=True).get(pk=product_id)
+
+
+def _applied_delta(stock, delta):
+    """
+    Variation réellement appliquée : une sortie ne prend que le stock positif (le stock
+    ne descend jamais sous 0, ni plus bas s'il est déjà négatif), une entrée est appliquée
+    telle quelle
+    """
+    if delta < 0:
+        return max(delta, -max(stock, 0))
+    return delta
+
+
+def apply_stock_deltas(deltas, reason=None, reference='', user=None, locked_stocks=None):
+    """
+    Applique les variations de stock {product_id: delta} et, si `reason` est fourni,
+    les inscrit au journal. Les sorties sont limitées au stock disponible (voir
+    _applied_delta) et le journal enregistre la variation réellement appliquée, pour
+    que photo + mouvements redonnent le stock.
+
+    `locked_stocks` ({product_id: stock}) évite de relire les stocks quand l'appelant les
+    a déjà verrouillés dans la transaction ; sinon ils sont lus avec select_for_update
+    (à appeler dans une transaction). Retourne les variations appliquées.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+    if locked_stocks is None:
+        locked_stocks = dict(Product.objects.select_for_update().filter(id__in=deltas).values_list('id', 'stock'))
+    applied = {
+        product_id: _applied_delta(locked_stocks[product_id], delta)
+        for product_id, delta in deltas.items()
+        if product_id in locked_stocks
+    }
+    applied = {product_id: delta for product_id, delta in applied.items() if delta}
+    if not applied:
+        return {}
+    if reason:
+        record_stock_movements(
+            [(product_id, delta, reason, reference) for product_id, delta in applied.items()], user=user
+        )
+    Product.objects.filter(id__in=applied).update(
+        updated_at=timezone.now(),
+        stock=F('stock') + Case(
+            *[When(id=product_id, then=Value(delta)) for product_id, delta in applied.items()],
+            output_field=IntegerField()
+        )
+    )
+    # update() ne déclenche pas post_save : invalider le cache explicitement
+    bump_model_version(Product)
+    return applied
+
+
+def take_stock_snapshots(taken_at=None):
+    """Enregistre le stock courant de tous les produits et retourne le nombre de photos"""
+    taken_at = taken_at or timezone.now()
+    snapshots = StockSnapshot.objects.bulk_create(
+        (
+            StockSnapshot(product_id=product_id, stock=stock, taken_at=taken_at)
+            for product_id, stock in Product.objects.values_list('id', 'stock').iterator()
+        ),
+        batch_size=1000,
+    )
+    return len(snapshots)
+
+
+def stock_at(product_id, when):
+    """
+    Stock d'un produit à une date donnée : photo la plus proche avant `when`
+    plus les mouvements suivants, ou à défaut photo suivante moins les mouvements
+    intermédiaires. Seuls les mouvements entre la photo et `when` sont lus.
+    """
+    before = StockSnapshot.objects.filter(product_id=product_id, taken_at__lte=when).order_by('-taken_at').first()
+    movements = StockMovement.objects.filter(product_id=product_id)
+    if before is not None:
+        delta = movements.filter(created_at__gt=before.taken_at, created_at__lte=when).aggregate(total=Sum('delta'))['total']
+        return before.stock + (delta or 0)
+
+    after = StockSnapshot.objects.filter(product_id=product_id, taken_at__gt=when).order_by('taken_at').first()
+    if after is not None:
+        delta = movements.filter(created_at__gt=when, created_at__lte=after.taken_at).aggregate(total=Sum('delta'))['total']
+        return after.stock - (delta or 0)
+
+    delta = movements.filter(created_at__lte=when).aggregate(total=Sum('delta'))['total']
+    return delta or 0
+
+
+def ledger_stock_queryset():
+    """
+    Produits annotés avec le stock attendu d'après le journal (`ledger_stock`),
+    calculé en une seule requête : dernière photo + somme des mouvements suivants.
+    """
+    latest = StockSnapshot.objects.filter(product=OuterRef('pk')).order_by('-taken_at')
+    products = Product.objects.annotate(
+        snapshot_stock=Coalesce(Subquery(latest.values('stock')[:1]), Value(0)),
+        snapshot_at=Coalesce(Subquery(latest.values('taken_at')[:1]), Value(LEDGER_EPOCH)),
+    )
+    deltas = StockMovement.objects.filter(
+        product=OuterRef('pk'), created_at__gt=OuterRef('snapshot_at')
+    ).order_by().values('product').annotate(total=Sum('delta')).values('total')
+    return products.annotate(
+        movements_total=Coalesce(Subquery(deltas, output_field=IntegerField()), Value(0)),
+    ).annotate(
+        ledger_stock=F('snapshot_stock') + F('movements_total'),
+    )
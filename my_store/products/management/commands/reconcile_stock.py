@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from products.ledger import ledger_stock_queryset, record_stock_movements
+
+
+class Command(BaseCommand):
+    help = 'Vérifie le stock des produits par rapport au journal des mouvements'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Ajouter au journal un mouvement de correction pour chaque écart',
+        )
+
+    def handle(self, *args, **options):
+        # Un seul passage agrégé : dernière photo + somme des mouvements suivants
+        drifts = list(
+            ledger_stock_queryset()
+            .exclude(stock=F('ledger_stock'))
+            .values_list('id', 'name', 'stock', 'ledger_stock')
+        )
+
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS('✓ Tous les stocks correspondent au journal.'))
+            return
+
+        for product_id, name, stock, ledger_stock in drifts:
+            self.stdout.write(
+                self.style.WARNING(f'{name} (#{product_id}) : stock {stock}, journal {ledger_stock} ({stock - ledger_stock:+d})')
+            )
+
+        if options['fix']:
+            with transaction.atomic():
+                record_stock_movements(
+                    (product_id, stock - ledger_stock, 'correction', 'reconcile_stock')
+                    for product_id, _, stock, ledger_stock in drifts
+                )
+            self.stdout.write(self.style.SUCCESS(f'✓ {len(drifts)} écart(s) corrigé(s) dans le journal.'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{len(drifts)} écart(s) détecté(s). Relancer avec --fix pour les corriger.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.ledger import take_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Enregistre une photo du stock de tous les produits (à planifier, par ex. chaque nuit)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = take_stock_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'✓ Stock de {count} produit(s) enregistré.'))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-17 20:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_existing_stock(apps, schema_editor):
+    """Photo initiale : le stock actuel sert de point de départ au journal"""
+    from django.utils import timezone
+
+    Product = apps.get_model('products', 'Product')
+    StockSnapshot = apps.get_model('products', 'StockSnapshot')
+    taken_at = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        (
+            StockSnapshot(product_id=product_id, stock=stock, taken_at=taken_at)
+            for product_id, stock in Product.objects.values_list('id', 'stock').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_cursor_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('initial', 'Stock initial'), ('sale', 'Vente'), ('sale_update', 'Modification de vente'), ('sale_delete', 'Suppression de vente'), ('adjustment', 'Ajustement manuel'), ('import', 'Import Excel'), ('correction', 'Correction de rapprochement')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='products_st_product_a806c1_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='products_st_product_f5fd10_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_stock, migrations.RunPython.noop),
+    ]
@@ -31,4 +31,46 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
+
+
+class StockMovement(models.Model):
+    """Journal des mouvements de stock (ajout uniquement, jamais modifié)"""
+    REASON_CHOICES = [
+        ('initial', 'Stock initial'),
+        ('sale', 'Vente'),
+        ('sale_update', 'Modification de vente'),
+        ('sale_delete', 'Suppression de vente'),
+        ('adjustment', 'Ajustement manuel'),
+        ('import', 'Import Excel'),
+        ('correction', 'Correction de rapprochement'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name} {self.delta:+d} ({self.get_reason_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['product', 'created_at'])]
+
+
+class StockSnapshot(models.Model):
+    """Photo périodique du stock d'un produit, point de départ des calculs historiques"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    stock = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.product.name} : {self.stock} au {self.taken_at.strftime('%d/%m/%Y %H:%M')}"
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [models.Index(fields=['product', 'taken_at'])]
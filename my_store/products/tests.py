@@ -1,3 +1,89 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.models import User
+from .ledger import stock_at, take_stock_snapshots
+from .models import Product, StockMovement
+
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='gerant', password='secret')
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/products/', {'name': 'Radio', 'price': '2500.00', 'stock': 10})
+        self.product = Product.objects.get(pk=response.data['id'])
+
+    def test_movements_recorded_for_stock_changes(self):
+        self.client.post(f'/api/products/{self.product.id}/update_stock/', {'action': 'add', 'quantity': 5}, format='json')
+        self.client.post('/api/sales/', {
+            'items': [{'product': self.product.id, 'quantity': 3, 'unit_price': '2500.00'}],
+        }, format='json')
+        reasons = list(StockMovement.objects.order_by('id').values_list('reason', 'delta'))
+        self.assertEqual(reasons, [('initial', 10), ('adjustment', 5), ('sale', -3)])
+
+    def test_stock_at_uses_snapshot_and_later_movements(self):
+        take_stock_snapshots()
+        checkpoint = timezone.now()
+        self.client.post('/api/sales/', {
+            'items': [{'product': self.product.id, 'quantity': 4, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(stock_at(self.product.id, checkpoint), 10)
+        self.assertEqual(stock_at(self.product.id, timezone.now() + timedelta(seconds=1)), 6)
+        response = self.client.get(f'/api/products/{self.product.id}/stock_at/', {'date': timezone.now().date().isoformat()})
+        self.assertEqual(response.data['stock'], 6)
+
+    def test_reconcile_detects_and_fixes_drift(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=7)
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('journal 10', out.getvalue())
+        call_command('reconcile_stock', '--fix', stdout=StringIO())
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('correspondent', out.getvalue())
+
+    def test_clamped_delta_is_recorded_as_applied(self):
+        from django.db import transaction
+        from .ledger import apply_stock_deltas
+        
+        with transaction.atomic():
+            applied = apply_stock_deltas({self.product.id: -25}, 'sale_delete', 'test')
+        self.assertEqual(applied, {self.product.id: -10})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(StockMovement.objects.filter(reason='sale_delete').get().delta, -10)
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('correspondent', out.getvalue())
+
+    def test_restock_on_negative_stock_is_applied_as_is(self):
+        from django.db import transaction
+        from .ledger import apply_stock_deltas
+        
+        Product.objects.filter(pk=self.product.pk).update(stock=-5)
+        with transaction.atomic():
+            self.assertEqual(apply_stock_deltas({self.product.id: 3}, 'sale_delete', 'test'), {self.product.id: 3})
+            # Une sortie ne rend pas le stock plus négatif
+            self.assertEqual(apply_stock_deltas({self.product.id: -1}, 'sale', 'test'), {})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, -2)
+        self.assertEqual(StockMovement.objects.filter(reason='sale_delete').get().delta, 3)
+
+    def test_sale_locks_product_rows_once(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/sales/', {
+                'items': [{'product': self.product.id, 'quantity': 3, 'unit_price': '2500.00'}],
+            }, format='json')
+        product_reads = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT "products_product"."id" AS "id", "products_product"."stock" AS "stock"')
+        ]
+        self.assertEqual(len(product_reads), 1)
@@ -3,20 +3,28 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from openpyxl import load_workbook
 from django.db import transaction
+from core.cache import CachedListMixin
+from core.conditional import ConditionalGetMixin
+from .importer import ImportFileError, import_products_workbook
+from .ledger import locked_stock, record_stock_movements
 from .models import Product, Category
 from .serializers import ProductSerializer, ProductListSerializer, CategorySerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    # Pas de champ updated_at : la version de cache suit les modifications
+    etag_models = (Category,)
     permission_classes = [IsAuthenticated]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
+    # La liste affiche le nom de la catégorie
+    cache_models = (Product, Category)
+    etag_models = (Category,)
     permission_classes = [IsAuthenticated]
 
     def get_serializer_class(self):
@@ -40,7 +48,20 @@ class ProductViewSet(viewsets.ModelViewSet):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            product = serializer.save(created_by=self.request.user)
+            record_stock_movements([(product.id, product.stock, 'initial', '')], user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Stock relu en verrouillant la ligne : une vente validée entre-temps n'est
+            # ni écrasée par l'enregistrement, ni comptée dans l'ajustement
+            previous_stock = locked_stock(serializer.instance.pk)
+            serializer.instance.stock = previous_stock
+            product = serializer.save()
+            record_stock_movements(
+                [(product.id, product.stock - previous_stock, 'adjustment', '')], user=self.request.user
+            )
 
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
@@ -48,17 +69,51 @@ class ProductViewSet(viewsets.ModelViewSet):
         quantity = request.data.get('quantity', 0)
         action_type = request.data.get('action', 'set')  # 'set', 'add', 'subtract'
 
-        if action_type == 'set':
-            product.stock = quantity
-        elif action_type == 'add':
-            product.stock += quantity
-        elif action_type == 'subtract':
-            product.stock = max(0, product.stock - quantity)
-
-        product.save()
+        with transaction.atomic():
+            previous_stock = product.stock = locked_stock(product.pk)
+            if action_type == 'set':
+                product.stock = quantity
+            elif action_type == 'add':
+                product.stock += quantity
+            elif action_type == 'subtract':
+                product.stock = max(0, product.stock - quantity)
+            product.save()
+            product.refresh_from_db(fields=['stock'])
+            record_stock_movements(
+                [(product.id, product.stock - previous_stock, 'adjustment', '')], user=request.user
+            )
         serializer = self.get_serializer(product)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def stock_at(self, request, pk=None):
+        """Stock du produit à une date passée (?date=AAAA-MM-JJ, fin de journée, ou date et heure ISO)"""
+        from datetime import datetime, time
+        from django.utils import timezone
+        from django.utils.dateparse import parse_date, parse_datetime
+        from .ledger import stock_at
+        
+        product = self.get_object()
+        value = request.query_params.get('date', '')
+        try:
+            day = parse_date(value)
+            when = datetime.combine(day, time.max) if day else parse_datetime(value)
+        except ValueError:
+            when = None
+        if when is None:
+            return Response(
+                {'error': 'Paramètre "date" invalide (format attendu : AAAA-MM-JJ)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        
+        return Response({
+            'product': product.id,
+            'date': when.isoformat(),
+            'stock': stock_at(product.id, when),
+        })
+
     @action(detail=False, methods=['post'], url_path='import-excel', parser_classes=[MultiPartParser, FormParser])
     def import_excel(self, request):
         """
@@ -81,90 +136,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Charger le workbook
-            workbook = load_workbook(excel_file, data_only=True)
-            sheet = workbook.active
-            
-            # Trouver les colonnes 'designation' et 'quantite'
-            header_row = None
-            designation_col = None
-            quantite_col = None
-            
-            # Chercher la ligne d'en-tête (premières 10 lignes)
-            for row_idx in range(1, min(11, sheet.max_row + 1)):
-                for col_idx in range(1, sheet.max_column + 1):
-                    cell_value = sheet.cell(row=row_idx, column=col_idx).value
-                    if cell_value:
-                        cell_str = str(cell_value).strip().lower()
-                        if 'designation' in cell_str or 'désignation' in cell_str:
-                            designation_col = col_idx
-                            header_row = row_idx
-                        if 'quantite' in cell_str or 'quantité' in cell_str or 'qte' in cell_str:
-                            quantite_col = col_idx
-                            header_row = row_idx
-            
-            if not designation_col or not quantite_col:
-                return Response(
-                    {'error': 'Colonnes "designation" et "quantite" non trouvées dans le fichier Excel'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Traiter les lignes de données
-            created_count = 0
-            updated_count = 0
-            errors = []
-            
-            start_row = header_row + 1 if header_row else 2
-            
-            with transaction.atomic():
-                for row_idx in range(start_row, sheet.max_row + 1):
-                    designation_cell = sheet.cell(row=row_idx, column=designation_col).value
-                    quantite_cell = sheet.cell(row=row_idx, column=quantite_col).value
-                    
-                    # Ignorer les lignes vides
-                    if not designation_cell:
-                        continue
-                    
-                    designation = str(designation_cell).strip()
-                    if not designation:
-                        continue
-                    
-                    # Convertir la quantité en entier
-                    try:
-                        if quantite_cell is None:
-                            quantite = 0
-                        else:
-                            quantite = int(float(str(quantite_cell)))
-                    except (ValueError, TypeError):
-                        errors.append(f"Ligne {row_idx}: Quantité invalide '{quantite_cell}'")
-                        continue
-                    
-                    # Chercher si le produit existe déjà (par nom)
-                    product, created = Product.objects.get_or_create(
-                        name=designation,
-                        defaults={
-                            'stock': quantite,
-                            'price': 0.00,  # Prix par défaut
-                            'is_active': True,
-                            'created_by': request.user
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                    else:
-                        # Mettre à jour le stock
-                        product.stock = quantite
-                        product.save()
-                        updated_count += 1
-
+            result = import_products_workbook(excel_file, excel_file.name, request.user)
             return Response({
                 'message': f'Import terminé avec succès',
-                'created': created_count,
-                'updated': updated_count,
-                'errors': errors if errors else None
+                **result,
             }, status=status.HTTP_200_OK)
 
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Erreur lors du traitement du fichier Excel: {str(e)}'},
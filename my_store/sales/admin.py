@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Sale, SaleItem, OutOfStockSale
+from django.db import transaction
+from .models import Sale, SaleItem, OutOfStockSale, StockReservation, DailySalesSummary, DailyProductSales
+from .rollups import record_stored_sales
 
 
 class SaleItemInline(admin.TabularInline):
@@ -7,6 +9,13 @@ class SaleItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['subtotal']
 
+    @admin.display(description='Sous-total')
+    def subtotal(self, obj):
+        # Ligne vierge du formulaire : pas encore de prix
+        if obj.quantity is None or obj.unit_price is None:
+            return '-'
+        return obj.subtotal
+
 
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
@@ -16,15 +25,79 @@ class SaleAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [SaleItemInline]
 
+    # Cumuls journaliers : la contribution enregistrée de la vente est retirée avant
+    # l'écriture et la nouvelle ajoutée une fois les items (inlines) enregistrés, dans
+    # la transaction de la page d'administration
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            record_stored_sales([obj.pk], sign=-1)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        record_stored_sales([form.instance.pk])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_stored_sales([obj.pk], sign=-1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            record_stored_sales(list(queryset.values_list('id', flat=True)), sign=-1)
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(SaleItem)
 class SaleItemAdmin(admin.ModelAdmin):
     list_display = ['sale', 'product', 'quantity', 'unit_price', 'subtotal']
     list_filter = ['sale__sale_date']
 
+    def _rewrite_sales(self, sale_ids, write):
+        """Remplace dans les cumuls la contribution des ventes touchées par `write`"""
+        sale_ids = list(sale_ids)
+        with transaction.atomic():
+            record_stored_sales(sale_ids, sign=-1)
+            write()
+            record_stored_sales(sale_ids)
+
+    def save_model(self, request, obj, form, change):
+        sale_ids = {obj.sale_id}
+        if change:
+            sale_ids.add(SaleItem.objects.values_list('sale_id', flat=True).get(pk=obj.pk))
+        self._rewrite_sales(sale_ids, lambda: super(SaleItemAdmin, self).save_model(request, obj, form, change))
+
+    def delete_model(self, request, obj):
+        self._rewrite_sales([obj.sale_id], lambda: super(SaleItemAdmin, self).delete_model(request, obj))
+
+    def delete_queryset(self, request, queryset):
+        sale_ids = set(queryset.values_list('sale_id', flat=True))
+        self._rewrite_sales(sale_ids, lambda: super(SaleItemAdmin, self).delete_queryset(request, queryset))
+
 
 @admin.register(OutOfStockSale)
 class OutOfStockSaleAdmin(admin.ModelAdmin):
     list_display = ['product', 'quantity_sold', 'sale', 'created_at']
     list_filter = ['created_at']
     search_fields = ['product__name']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['token', 'product', 'quantity', 'created_by', 'expires_at']
+    list_filter = ['expires_at']
+    search_fields = ['token', 'product__name']
+
+
+@admin.register(DailySalesSummary)
+class DailySalesSummaryAdmin(admin.ModelAdmin):
+    list_display = ['day', 'revenue', 'sale_count', 'units']
+    date_hierarchy = 'day'
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ['day', 'product', 'revenue', 'units', 'sale_count']
+    list_filter = ['day']
+    search_fields = ['product__name']
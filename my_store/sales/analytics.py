@@ -0,0 +1,172 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+from .models import DailyProductSales, DailySalesSummary, Sale, SaleItem
+
+ABC_METRICS = ('revenue', 'units')
+
+PERIODS = {'day': TruncDate, 'week': TruncWeek, 'month': TruncMonth}
+
+# Dimension -> (champs groupés sur SaleItem, construction du libellé)
+DIMENSIONS = {
+    'product': (
+        ('product_id', 'product__name'),
+        lambda row: {'id': row['product_id'], 'label': row['product__name']},
+    ),
+    'category': (
+        ('product__category_id', 'product__category__name'),
+        lambda row: {'id': row['product__category_id'], 'label': row['product__category__name'] or 'Sans catégorie'},
+    ),
+    'customer': (
+        ('sale__customer_id', 'sale__customer__first_name', 'sale__customer__last_name'),
+        lambda row: {
+            'id': row['sale__customer_id'],
+            'label': (
+                f"{row['sale__customer__first_name']} {row['sale__customer__last_name']}".strip()
+                if row['sale__customer_id'] else 'Client anonyme'
+            ),
+        },
+    ),
+    'payment_method': (
+        ('sale__payment_method',),
+        lambda row: {
+            'id': row['sale__payment_method'],
+            'label': dict(Sale._meta.get_field('payment_method').choices).get(
+                row['sale__payment_method'], row['sale__payment_method']
+            ),
+        },
+    ),
+    'cashier': (
+        ('sale__created_by_id', 'sale__created_by__username'),
+        lambda row: {'id': row['sale__created_by_id'], 'label': row['sale__created_by__username'] or 'Inconnu'},
+    ),
+}
+
+
+def _period_value(value):
+    if value is None:
+        return None
+    return value.date().isoformat() if hasattr(value, 'date') else value.isoformat()
+
+
+def _money(value):
+    return float(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def sales_analytics(period=None, dimension=None, date_from=None, date_to=None):
+    """
+    Chiffre d'affaires, unités et nombre de tickets groupés par période (jour, semaine,
+    mois) et/ou par dimension, en une seule requête GROUP BY.
+
+    Sans dimension, la requête porte sur les cumuls journaliers (une ligne par jour) ;
+    sinon elle porte sur SaleItem joint aux ventes, produits et catégories.
+    """
+    if dimension is None:
+        return _from_rollups(period, date_from, date_to)
+
+    queryset = SaleItem.objects.annotate(day=TruncDate('sale__sale_date'))
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+
+    fields, label = DIMENSIONS[dimension]
+    group_by = list(fields)
+    if period:
+        queryset = queryset.annotate(period=PERIODS[period]('sale__sale_date'))
+        group_by.insert(0, 'period')
+
+    rows = (
+        queryset.order_by().values(*group_by)
+        .annotate(
+            revenue=Sum(ExpressionWrapper(
+                F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+            )),
+            units=Sum('quantity'),
+            tickets=Count('sale_id', distinct=True),
+        )
+        .order_by(*(['period'] if period else []), '-revenue')
+    )
+    results = []
+    for row in rows:
+        entry = {}
+        if period:
+            entry['period'] = _period_value(row['period'])
+        entry.update(label(row))
+        entry.update(revenue=_money(row['revenue']), units=row['units'] or 0, tickets=row['tickets'])
+        results.append(entry)
+    return results
+
+
+def _from_rollups(period, date_from, date_to):
+    queryset = DailySalesSummary.objects.all()
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+
+    totals = {'revenue': Sum('revenue'), 'units': Sum('units'), 'tickets': Sum('sale_count')}
+    if not period:
+        row = queryset.aggregate(**totals)
+        return [{'revenue': _money(row['revenue']), 'units': row['units'] or 0, 'tickets': row['tickets'] or 0}]
+
+    # Les cumuls sont déjà journaliers : seules la semaine et le mois sont tronqués
+    rows = (
+        queryset.annotate(period=F('day') if period == 'day' else PERIODS[period]('day'))
+        .order_by().values('period').annotate(**totals).order_by('period')
+    )
+    return [
+        {
+            'period': _period_value(row['period']),
+            'revenue': _money(row['revenue']),
+            'units': row['units'] or 0,
+            'tickets': row['tickets'] or 0,
+        }
+        for row in rows
+        # Jours dont toutes les ventes ont été supprimées
+        if row['tickets']
+    ]
+
+
+def abc_analysis(date_from=None, date_to=None, metric='revenue', a_share=80, b_share=95):
+    """
+    Classe les produits par chiffre d'affaires ou unités sur la période et leur attribue
+    une classe A/B/C selon la part cumulée : un produit est en A si la part cumulée des
+    produits mieux classés est inférieure à `a_share` %, en B sous `b_share` %, sinon en C.
+    Lit la table matérialisée par produit et par jour (une requête GROUP BY produit).
+    """
+    queryset = DailyProductSales.objects.all()
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+
+    other = 'units' if metric == 'revenue' else 'revenue'
+    rows = list(
+        queryset.order_by().values('product_id', 'product__name')
+        .annotate(revenue=Sum('revenue'), units=Sum('units'), tickets=Sum('sale_count'))
+        .filter(**{f'{metric}__gt': 0})
+        .order_by(f'-{metric}', f'-{other}', 'product__name')
+    )
+    total = sum(Decimal(row[metric] or 0) for row in rows)
+
+    results = []
+    cumulative = Decimal('0')
+    for rank, row in enumerate(rows, start=1):
+        value = Decimal(row[metric] or 0)
+        before = cumulative * 100 / total if total else Decimal('0')
+        cumulative += value
+        results.append({
+            'rank': rank,
+            'id': row['product_id'],
+            'label': row['product__name'],
+            'revenue': _money(row['revenue']),
+            'units': row['units'] or 0,
+            'tickets': row['tickets'] or 0,
+            'share': round(float(value * 100 / total), 2) if total else 0.0,
+            'cumulative_share': round(float(cumulative * 100 / total), 2) if total else 0.0,
+            'class': 'A' if before < a_share else 'B' if before < b_share else 'C',
+        })
+    return results
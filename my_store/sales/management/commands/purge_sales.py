@@ -0,0 +1,131 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from core.rollups import new_deltas, payment_field
+from products.ledger import apply_stock_deltas
+from sales.rollups import apply_sales_deltas, product_day_rows
+from sales.models import Sale, SaleItem, OutOfStockSale
+
+
+class Command(BaseCommand):
+    help = (
+        'Supprime les ventes d\'une période (et/ou d\'un client) par paquets, '
+        'en restaurant les stocks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--to', dest='date_to', help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument('--customer', type=int, help='Limiter aux ventes de ce client (id)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher ce qui serait supprimé sans rien modifier',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de ventes supprimées par transaction (500 par défaut)',
+        )
+        parser.add_argument(
+            '--confirm',
+            action='store_true',
+            help='Confirmer la suppression sans demander de confirmation',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Sale.objects.all()
+        for option, lookup in (('date_from', 'sale_date__date__gte'), ('date_to', 'sale_date__date__lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f'Date invalide : {options[option]} (format attendu : AAAA-MM-JJ)')
+                queryset = queryset.filter(**{lookup: day})
+        if options['customer']:
+            queryset = queryset.filter(customer_id=options['customer'])
+        chunk_size = max(1, min(options['chunk_size'], 900))
+
+        # Compter les ventes sans les charger (pour éviter l'erreur Decimal)
+        count = queryset.count()
+        if count == 0:
+            self.stdout.write(self.style.WARNING('Aucune vente à supprimer'))
+            return
+
+        if options['dry_run']:
+            restored = (
+                SaleItem.objects.filter(sale__in=queryset)
+                .order_by().values('product_id').annotate(total=Sum('quantity'))
+            )
+            units = sum(row['total'] or 0 for row in restored)
+            self.stdout.write(
+                f'{count} vente(s) seraient supprimées, {units} unité(s) remises en stock '
+                f'sur {len(restored)} produit(s). Aucune modification effectuée.'
+            )
+            return
+
+        if not options['confirm']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'⚠️  ATTENTION : Cette action va supprimer {count} vente(s) et toutes les données associées !'
+                )
+            )
+            confirm = input('Êtes-vous sûr de vouloir continuer ? (oui/non): ')
+            if confirm.lower() not in ['oui', 'o', 'yes', 'y']:
+                self.stdout.write(self.style.ERROR('Opération annulée'))
+                return
+
+        deleted = 0
+        sale_table = connection.ops.quote_name(Sale._meta.db_table)
+        while True:
+            # Une transaction courte par paquet : le verrou d'écriture n'est jamais gardé longtemps
+            with transaction.atomic():
+                sale_ids = list(queryset.order_by('id').values_list('id', flat=True)[:chunk_size])
+                if not sale_ids:
+                    break
+
+                # Restaurer les stocks du paquet en une mise à jour groupée par produit
+                restored = (
+                    SaleItem.objects.filter(sale_id__in=sale_ids)
+                    .order_by().values('product_id').annotate(total=Sum('quantity'))
+                )
+                apply_stock_deltas(
+                    {row['product_id']: row['total'] or 0 for row in restored},
+                    'sale_delete', 'purge_sales'
+                )
+
+                # Retirer les ventes du paquet des cumuls journaliers (agrégats par jour)
+                deltas = new_deltas()
+                for row in (
+                    Sale.objects.filter(id__in=sale_ids).annotate(day=TruncDate('sale_date'))
+                    .order_by().values('day', 'payment_method')
+                    .annotate(revenue=Sum('total_amount'), count=Count('id'))
+                ):
+                    entry = deltas[row['day']]
+                    entry['revenue'] -= row['revenue'] or 0
+                    entry['sale_count'] -= row['count']
+                    entry[payment_field(row['payment_method'])] -= row['revenue'] or 0
+                product_deltas = new_deltas()
+                for row in product_day_rows(SaleItem.objects.filter(sale_id__in=sale_ids)):
+                    deltas[row['day']]['units'] -= row['units'] or 0
+                    entry = product_deltas[(row['day'], row['product_id'])]
+                    entry['units'] -= row['units'] or 0
+                    entry['revenue'] -= row['revenue'] or 0
+                    entry['sale_count'] -= row['sale_count']
+                apply_sales_deltas(deltas, product_deltas)
+
+                OutOfStockSale.objects.filter(sale_id__in=sale_ids).delete()
+                SaleItem.objects.filter(sale_id__in=sale_ids).delete()
+                # SQL direct pour ne pas charger les ventes (erreur Decimal)
+                with connection.cursor() as cursor:
+                    placeholders = ', '.join(['%s'] * len(sale_ids))
+                    cursor.execute(f'DELETE FROM {sale_table} WHERE id IN ({placeholders})', sale_ids)
+
+            deleted += len(sale_ids)
+            self.stdout.write(f'  {deleted}/{count} vente(s) supprimée(s)...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {deleted} vente(s) supprimée(s) avec succès. Les stocks ont été restaurés.')
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-17 20:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_cursor_ordering_indexes'),
+        ('products', '0002_cursor_ordering_indexes'),
+        ('sales', '0002_outofstocksale'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outofstocksale',
+            index=models.Index(fields=['created_at'], name='sales_outof_created_608f30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_date'], name='sales_sale_sale_da_2fd927_idx'),
+        ),
+    ]
@@ -37,6 +37,7 @@ class Sale(models.Model):
 
     class Meta:
         ordering = ['-sale_date']
+        indexes = [models.Index(fields=['sale_date'])]
 
 
 class SaleItem(models.Model):
@@ -70,4 +71,59 @@ class OutOfStockSale(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
+
+
+class StockReservation(models.Model):
+    """Quantité réservée temporairement lors de la vérification de stock d'un panier"""
+    token = models.CharField(max_length=64, db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.IntegerField()
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_reservations')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} (jusqu'à {self.expires_at.strftime('%H:%M')})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['product', 'expires_at'])]
+
+
+class DailySalesSummary(models.Model):
+    """Cumul journalier des ventes, tenu à jour dans les mêmes transactions que les ventes"""
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    sale_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    cash_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    card_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    check_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    transfer_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    other_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"Ventes du {self.day.strftime('%d/%m/%Y')} : {self.revenue}"
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = "Daily sales summaries"
+
+
+class DailyProductSales(models.Model):
+    """Ventes cumulées par produit et par jour (table matérialisée pour les classements ABC)"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    units = models.IntegerField(default=0)
+    sale_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product.name} le {self.day.strftime('%d/%m/%Y')} : {self.units}"
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales')]
+        verbose_name_plural = "Daily product sales"
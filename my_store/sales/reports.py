@@ -0,0 +1,50 @@
+from my_store.exports import Report
+from my_store.streaming import STREAM_CHUNK_SIZE
+from .models import Sale, SaleItem
+
+
+def sales_report(params):
+    """Rapport des ventes d'une période (date_from / date_to, AAAA-MM-JJ)"""
+    date_from = params.get('date_from') or None
+    date_to = params.get('date_to') or None
+
+    queryset = Sale.objects.all()
+    if date_from:
+        queryset = queryset.filter(sale_date__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(sale_date__date__lte=date_to)
+
+    return Report(
+        f"rapport_ventes_{date_from or 'all'}_{date_to or 'all'}",
+        "Rapport des Ventes",
+        ['Date', 'Heure', 'ID Vente', 'Produit', 'Quantité', 'Prix Unitaire', 'Total', 'Méthode de Paiement'],
+        [12, 10, 10, 30, 10, 12, 12, 15],
+        _sales_report_lines(queryset),
+        6,
+    )
+
+
+def _sales_report_lines(queryset):
+    """
+    Lignes du rapport des ventes (valeurs, sous-total) : items, produits et ventes
+    joints en une requête, lus par paquets.
+    """
+    payment_methods = dict(Sale._meta.get_field('payment_method').choices)
+    rows = (
+        SaleItem.objects.filter(sale__in=queryset)
+        .order_by('sale__sale_date', 'sale_id', 'id')
+        .values_list('sale__sale_date', 'sale_id', 'product__name', 'quantity', 'unit_price', 'sale__payment_method')
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    for sale_date, sale_id, product_name, quantity, unit_price, payment_method in rows:
+        subtotal = quantity * unit_price
+        yield [
+            sale_date.strftime('%d/%m/%Y'),
+            sale_date.strftime('%H:%M'),
+            sale_id,
+            product_name,
+            quantity,
+            unit_price,
+            subtotal,
+            payment_methods.get(payment_method, payment_method),
+        ], subtotal
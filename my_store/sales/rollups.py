@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.rollups import apply_rollup_deltas, new_deltas, payment_field
+from .models import DailyProductSales, DailySalesSummary, Sale, SaleItem
+
+
+def sale_day(sale_date):
+    return timezone.localdate(sale_date) if timezone.is_aware(sale_date) else sale_date.date()
+
+
+def line_items(lines):
+    """Lignes nettoyées (_clean_item_lines) -> tuples (product_id, quantité, prix unitaire)"""
+    return [(line['product'].id, line['quantity'], line['unit_price']) for line in lines]
+
+
+def add_sale(deltas, sale_date, total, units, payment_method, sign=1):
+    """Ajoute (sign=1) ou retire (sign=-1) la contribution d'une vente au cumul de son jour"""
+    entry = deltas[sale_day(sale_date)]
+    entry['revenue'] += sign * total
+    entry['sale_count'] += sign
+    entry['units'] += sign * units
+    entry[payment_field(payment_method)] += sign * total
+    return deltas
+
+
+def add_sale_products(deltas, sale_date, items, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) les items (product_id, quantité, prix unitaire)
+    d'une vente au cumul par produit et par jour ; une vente compte une fois par produit.
+    """
+    day = sale_day(sale_date)
+    per_product = {}
+    for product_id, quantity, unit_price in items:
+        units, revenue = per_product.get(product_id, (0, Decimal('0.00')))
+        per_product[product_id] = (units + quantity, revenue + quantity * unit_price)
+    for product_id, (units, revenue) in per_product.items():
+        entry = deltas[(day, product_id)]
+        entry['revenue'] += sign * revenue
+        entry['units'] += sign * units
+        entry['sale_count'] += sign
+    return deltas
+
+
+def product_day_rows(items):
+    """
+    Agrège un queryset de SaleItem par (jour, produit) en une requête GROUP BY :
+    lignes {'day', 'product_id', 'units', 'revenue', 'sale_count'}.
+    """
+    return (
+        items.annotate(day=TruncDate('sale__sale_date'))
+        .order_by().values('day', 'product_id')
+        .annotate(
+            units=Sum('quantity'),
+            revenue=Sum(ExpressionWrapper(
+                F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+            )),
+            sale_count=Count('sale_id', distinct=True),
+        )
+    )
+
+
+def record_sale(sale, items, sign=1):
+    """Met à jour les cumuls (jour et produit/jour) pour une seule vente"""
+    apply_sales_deltas(
+        add_sale(new_deltas(), sale.sale_date, sale.total_amount, sum(item[1] for item in items), sale.payment_method, sign),
+        add_sale_products(new_deltas(), sale.sale_date, items, sign),
+    )
+
+
+def apply_sales_deltas(deltas, product_deltas=None):
+    apply_rollup_deltas(DailySalesSummary, deltas)
+    if product_deltas:
+        apply_rollup_deltas(DailyProductSales, product_deltas, key_fields=('day', 'product_id'))
+
+
+def record_stored_sales(sale_ids, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) des cumuls les ventes telles qu'enregistrées en
+    base (ventes et items relus en deux requêtes) ; les ventes absentes sont ignorées.
+    Sert aux écritures qui ne passent pas par l'API (administration).
+    """
+    items_by_sale = {}
+    for sale_id, product_id, quantity, unit_price in (
+        SaleItem.objects.filter(sale_id__in=sale_ids).values_list('sale_id', 'product_id', 'quantity', 'unit_price')
+    ):
+        items_by_sale.setdefault(sale_id, []).append((product_id, quantity, unit_price))
+
+    deltas = new_deltas()
+    product_deltas = new_deltas()
+    for sale in Sale.objects.filter(id__in=sale_ids).only('id', 'sale_date', 'total_amount', 'payment_method'):
+        items = items_by_sale.get(sale.id, [])
+        add_sale(deltas, sale.sale_date, sale.total_amount, sum(item[1] for item in items), sale.payment_method, sign)
+        add_sale_products(product_deltas, sale.sale_date, items, sign)
+    if deltas:
+        apply_sales_deltas(deltas, product_deltas)
@@ -1,8 +1,17 @@
+import logging
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import serializers
-from .models import Sale, SaleItem, OutOfStockSale
+from . import rollups
+from .models import Sale, SaleItem, OutOfStockSale, StockReservation
+from core.rollups import new_deltas
+from products.ledger import apply_stock_deltas, record_stock_movements
+from products.models import Product
 from products.serializers import ProductSerializer
 from customers.serializers import CustomerSerializer
 
+logger = logging.getLogger(__name__)
+
 
 class SaleItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -125,10 +134,12 @@ class SaleSerializer(serializers.ModelSerializer):
 class SaleCreateSerializer(serializers.ModelSerializer):
     items = SaleItemCreateSerializer(many=True)
     out_of_stock_info = serializers.SerializerMethodField()
+    # Jeton renvoyé par check_stock (reserve=true) : la réservation est consommée par la vente
+    reservation = serializers.CharField(write_only=True, required=False, allow_blank=True)
 
     class Meta:
         model = Sale
-        fields = ['customer', 'payment_method', 'notes', 'items', 'out_of_stock_info']
+        fields = ['customer', 'payment_method', 'notes', 'items', 'out_of_stock_info', 'reservation']
     
     def get_out_of_stock_info(self, obj):
         # Retourner les informations sur les ventes hors stock si elles existent
@@ -138,88 +149,32 @@ class SaleCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         from django.db import transaction
-        from .models import OutOfStockSale
         
         items_data = validated_data.pop('items')
+        reservation = validated_data.pop('reservation', None)
+        lines = _clean_item_lines(items_data)
+        total = sum((line['quantity'] * line['unit_price'] for line in lines), Decimal('0.00'))
         
         # Utiliser une transaction pour garantir la cohérence
         with transaction.atomic():
-            sale = Sale.objects.create(**validated_data)
+            if reservation:
+                # Seule une réservation de cet utilisateur est consommée : le jeton d'une
+                # autre caisse ne libère pas son stock
+                StockReservation.objects.filter(token=reservation, created_by=validated_data.get('created_by')).delete()
             
-            # Create sale items et gérer les stocks
-            total = 0
-            out_of_stock_items = []
+            sale = Sale.objects.create(total_amount=total, **validated_data)
             
-            for item_data in items_data:
-                # Utiliser .get() pour éviter KeyError
-                product = item_data.get('product')
-                if not product:
-                    continue
-                
-                quantity = item_data.get('quantity', 0)
-                if quantity is None:
-                    quantity = 0
-                
-                # Récupérer le prix unitaire, avec fallback sur le prix du produit
-                unit_price = item_data.get('unit_price')
-                if unit_price is None:
-                    unit_price = product.price if hasattr(product, 'price') else 0
-                
-                # S'assurer que quantity et unit_price sont des nombres valides
-                try:
-                    quantity = int(quantity) if quantity else 0
-                except (ValueError, TypeError):
-                    quantity = 0
-                
-                try:
-                    from decimal import Decimal
-                    if not isinstance(unit_price, Decimal):
-                        unit_price = Decimal(str(unit_price)) if unit_price else Decimal('0.00')
-                except (ValueError, TypeError):
-                    unit_price = product.price if hasattr(product, 'price') else Decimal('0.00')
-                
-                # Créer l'item de vente
-                SaleItem.objects.create(
-                    sale=sale,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=unit_price
-                )
-                total += quantity * unit_price
-                
-                # Gérer le stock
-                current_stock = product.stock
-                if current_stock >= quantity:
-                    # Stock suffisant : déduire normalement
-                    product.stock = current_stock - quantity
-                    product.save(update_fields=['stock'])
-                else:
-                    # Stock insuffisant : mettre à 0 et enregistrer le surplus
-                    surplus = quantity - current_stock
-                    product.stock = 0
-                    product.save(update_fields=['stock'])
-                    
-                    # Enregistrer la vente hors stock
-                    try:
-                        OutOfStockSale.objects.create(
-                            product=product,
-                            quantity_sold=surplus,
-                            sale=sale,
-                            notes=f"{product.name} {surplus} pièces vendues hors stock"
-                        )
-                        out_of_stock_items.append({
-                            'product': product.name,
-                            'quantity': surplus
-                        })
-                    except Exception as e:
-                        # Si l'enregistrement échoue, on continue quand même
-                        # mais on log l'erreur
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Erreur lors de l'enregistrement de la vente hors stock: {e}")
+            # Créer tous les items en une seule insertion
+            SaleItem.objects.bulk_create([
+                SaleItem(sale=sale, product=line['product'], quantity=line['quantity'], unit_price=line['unit_price'])
+                for line in lines
+            ])
+            
+            # Déduire les stocks et enregistrer les ventes hors stock
+            out_of_stock_items = _deduct_stock(sale, lines)
             
-            sale.total_amount = total
-            sale.save(update_fields=['total_amount'])
+            # Mettre à jour les cumuls journaliers
+            rollups.record_sale(sale, rollups.line_items(lines))
             
             # Retourner la vente avec les informations sur les stocks insuffisants
             if out_of_stock_items:
@@ -259,106 +214,61 @@ class SaleUpdateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         from django.db import transaction
-        from .models import OutOfStockSale
         
         items_data = validated_data.pop('items', None)
+        previous_method = instance.payment_method
+        previous_total = instance.total_amount
         
         if items_data is None:
             # Si pas d'items, juste mettre à jour les autres champs
-            for attr, value in validated_data.items():
-                setattr(instance, attr, value)
-            instance.save()
+            with transaction.atomic():
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                instance.save()
+                if instance.payment_method != previous_method:
+                    # Seule la répartition par moyen de paiement change dans le cumul
+                    deltas = rollups.add_sale(new_deltas(), instance.sale_date, previous_total, 0, previous_method, -1)
+                    rollups.add_sale(deltas, instance.sale_date, previous_total, 0, instance.payment_method)
+                    rollups.apply_sales_deltas(deltas)
             return instance
         
+        lines = _clean_item_lines(items_data)
+        
         # Utiliser une transaction pour garantir la cohérence
         with transaction.atomic():
-            # Restaurer les stocks des anciens items
-            for old_item in instance.items.all():
-                product = old_item.product
-                product.stock += old_item.quantity
-                product.save(update_fields=['stock'])
+            old_items = list(instance.items.all())
+            previous_items = [(item.product_id, item.quantity, item.unit_price) for item in old_items]
+            
+            # Appliquer uniquement la variation nette de stock par produit
+            request = self.context.get('request')
+            user = request.user if request and request.user.is_authenticated else None
+            out_of_stock_items = _restock_and_deduct(instance, old_items, lines, user)
             
-            # Supprimer les anciens items et les enregistrements hors stock
-            instance.items.all().delete()
-            OutOfStockSale.objects.filter(sale=instance).delete()
+            # Ne modifier que les items qui ont changé (après le calcul des stocks,
+            # qui a besoin des anciennes quantités)
+            _reconcile_items(instance, old_items, lines)
             
-            # Mettre à jour les autres champs
+            # Mettre à jour les autres champs et le total
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
+            instance.total_amount = sum(
+                (line['quantity'] * line['unit_price'] for line in lines), Decimal('0.00')
+            )
             instance.save()
             
-            # Créer les nouveaux items et gérer les stocks
-            total = 0
-            out_of_stock_items = []
-            
-            for item_data in items_data:
-                # Utiliser .get() pour éviter KeyError
-                product = item_data.get('product')
-                if not product:
-                    continue
-                
-                quantity = item_data.get('quantity', 0)
-                if quantity is None:
-                    quantity = 0
-                
-                # Récupérer le prix unitaire, avec fallback sur le prix du produit
-                unit_price = item_data.get('unit_price')
-                if unit_price is None:
-                    unit_price = product.price if hasattr(product, 'price') else 0
-                
-                # S'assurer que quantity et unit_price sont des nombres valides
-                try:
-                    quantity = int(quantity) if quantity else 0
-                except (ValueError, TypeError):
-                    quantity = 0
-                
-                try:
-                    from decimal import Decimal
-                    if not isinstance(unit_price, Decimal):
-                        unit_price = Decimal(str(unit_price)) if unit_price else Decimal('0.00')
-                except (ValueError, TypeError):
-                    unit_price = product.price if hasattr(product, 'price') else Decimal('0.00')
-                
-                # Créer l'item de vente
-                SaleItem.objects.create(
-                    sale=instance,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=unit_price
-                )
-                total += quantity * unit_price
-                
-                # Gérer le stock
-                current_stock = product.stock
-                if current_stock >= quantity:
-                    # Stock suffisant : déduire normalement
-                    product.stock = current_stock - quantity
-                    product.save(update_fields=['stock'])
-                else:
-                    # Stock insuffisant : mettre à 0 et enregistrer le surplus
-                    surplus = quantity - current_stock
-                    product.stock = 0
-                    product.save(update_fields=['stock'])
-                    
-                    # Enregistrer la vente hors stock
-                    try:
-                        OutOfStockSale.objects.create(
-                            product=product,
-                            quantity_sold=surplus,
-                            sale=instance,
-                            notes=f"{product.name} {surplus} pièces vendues hors stock"
-                        )
-                        out_of_stock_items.append({
-                            'product': product.name,
-                            'quantity': surplus
-                        })
-                    except Exception as e:
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.error(f"Erreur lors de l'enregistrement de la vente hors stock: {e}")
-            
-            instance.total_amount = total
-            instance.save(update_fields=['total_amount'])
+            # Remplacer la contribution de la vente dans les cumuls journaliers
+            items = rollups.line_items(lines)
+            deltas = rollups.add_sale(
+                new_deltas(), instance.sale_date, previous_total,
+                sum(item[1] for item in previous_items), previous_method, -1
+            )
+            rollups.add_sale(
+                deltas, instance.sale_date, instance.total_amount,
+                sum(item[1] for item in items), instance.payment_method
+            )
+            product_deltas = rollups.add_sale_products(new_deltas(), instance.sale_date, previous_items, -1)
+            rollups.add_sale_products(product_deltas, instance.sale_date, items)
+            rollups.apply_sales_deltas(deltas, product_deltas)
             
             # Retourner la vente avec les informations sur les stocks insuffisants
             if out_of_stock_items:
@@ -373,3 +283,338 @@ class OutOfStockSaleSerializer(serializers.ModelSerializer):
     class Meta:
         model = OutOfStockSale
         fields = ['id', 'product', 'product_name', 'quantity_sold', 'sale', 'created_at', 'notes']
+
+
+class SaleBatchItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, default=0)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class SaleBatchEntrySerializer(serializers.Serializer):
+    reference = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    payment_method = serializers.ChoiceField(
+        choices=Sale._meta.get_field('payment_method').choices, default='cash'
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = SaleBatchItemSerializer(many=True)
+
+
+class SaleBatchSerializer(serializers.Serializer):
+    """
+    Enregistre un lot de ventes (synchronisation des caisses hors ligne) :
+    produits et clients sont résolus en une requête chacun, et tous les
+    mouvements de stock sont appliqués dans une seule transaction.
+    Ces ventes ont déjà eu lieu en caisse : elles ignorent les réservations
+    de stock des paniers en cours.
+    """
+    sales = SaleBatchEntrySerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_sales(self, sales):
+        from customers.models import Customer
+        
+        product_ids = {item['product'] for sale in sales for item in sale['items']}
+        customer_ids = {sale['customer'] for sale in sales if sale.get('customer')}
+        products = Product.objects.in_bulk(product_ids)
+        customers = Customer.objects.in_bulk(customer_ids)
+        
+        errors = {}
+        for index, sale in enumerate(sales):
+            sale_errors = {}
+            missing = sorted({item['product'] for item in sale['items']} - products.keys())
+            if missing:
+                sale_errors['items'] = [f"Produit(s) introuvable(s) : {', '.join(map(str, missing))}"]
+            if sale.get('customer') and sale['customer'] not in customers:
+                sale_errors['customer'] = [f"Client introuvable : {sale['customer']}"]
+            if sale_errors:
+                errors[index] = sale_errors
+                continue
+            sale['customer'] = customers.get(sale.get('customer'))
+            for item in sale['items']:
+                item['product'] = products[item['product']]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return sales
+
+    def create(self, validated_data):
+        from django.db import transaction
+        
+        created_by = validated_data.get('created_by')
+        entries = []
+        for data in validated_data['sales']:
+            lines = _clean_item_lines(data['items'])
+            sale = Sale(
+                customer=data.get('customer'),
+                payment_method=data['payment_method'],
+                notes=data.get('notes', ''),
+                created_by=created_by,
+                total_amount=sum((line['quantity'] * line['unit_price'] for line in lines), Decimal('0.00')),
+            )
+            entries.append((data.get('reference', ''), sale, lines))
+        
+        with transaction.atomic():
+            Sale.objects.bulk_create([sale for _, sale, _ in entries])
+            SaleItem.objects.bulk_create([
+                SaleItem(sale=sale, product=line['product'], quantity=line['quantity'], unit_price=line['unit_price'])
+                for _, sale, lines in entries
+                for line in lines
+            ])
+            
+            # Verrouiller une seule fois tous les produits du lot, puis appliquer
+            # les ventes dans l'ordre de réception
+            stocks = _lock_stocks({line['product'].id for _, _, lines in entries for line in lines})
+            initial = dict(stocks)
+            results = []
+            out_of_stock_records = []
+            movements = []
+            for reference, sale, lines in entries:
+                before = {line['product'].id: stocks[line['product'].id] for line in lines}
+                surpluses = _apply_lines(lines, stocks)
+                movements += [
+                    (product_id, stocks[product_id] - stock, 'sale', _sale_reference(sale))
+                    for product_id, stock in before.items()
+                ]
+                out_of_stock_records += [
+                    _out_of_stock_record(sale, product, surplus) for product, surplus in surpluses
+                ]
+                results.append({
+                    'reference': reference,
+                    'id': sale.id,
+                    'total_amount': str(sale.total_amount),
+                    'out_of_stock_info': _out_of_stock_info(surpluses),
+                })
+            apply_stock_deltas(
+                {product_id: stocks[product_id] - initial.get(product_id, 0) for product_id in stocks},
+                locked_stocks=initial
+            )
+            record_stock_movements(movements, user=created_by)
+            if out_of_stock_records:
+                OutOfStockSale.objects.bulk_create(out_of_stock_records)
+            
+            # Cumuls journaliers de tout le lot
+            deltas = new_deltas()
+            product_deltas = new_deltas()
+            for _, sale, lines in entries:
+                rollups.add_sale(
+                    deltas, sale.sale_date, sale.total_amount,
+                    sum(line['quantity'] for line in lines), sale.payment_method
+                )
+                rollups.add_sale_products(product_deltas, sale.sale_date, rollups.line_items(lines))
+            rollups.apply_sales_deltas(deltas, product_deltas)
+        
+        return results
+
+
+def _clean_item_lines(items_data):
+    """
+    Normalise les items reçus (quantité entière, prix unitaire Decimal avec repli
+    sur le prix du produit) et ignore ceux qui n'ont pas de produit.
+    """
+    lines = []
+    for item_data in items_data:
+        # Utiliser .get() pour éviter KeyError
+        product = item_data.get('product')
+        if not product:
+            continue
+        
+        quantity = item_data.get('quantity', 0)
+        if quantity is None:
+            quantity = 0
+        
+        # Récupérer le prix unitaire, avec fallback sur le prix du produit
+        unit_price = item_data.get('unit_price')
+        if unit_price is None:
+            unit_price = product.price if hasattr(product, 'price') else 0
+        
+        # S'assurer que quantity et unit_price sont des nombres valides
+        try:
+            quantity = int(quantity) if quantity else 0
+        except (ValueError, TypeError):
+            quantity = 0
+        
+        try:
+            if not isinstance(unit_price, Decimal):
+                unit_price = Decimal(str(unit_price)) if unit_price else Decimal('0.00')
+        except (ValueError, TypeError, InvalidOperation):
+            unit_price = product.price if hasattr(product, 'price') else Decimal('0.00')
+        
+        lines.append({'product': product, 'quantity': quantity, 'unit_price': unit_price})
+    return lines
+
+
+def held_quantities(product_ids, exclude_token=None, user=None):
+    """
+    Quantités réservées et non expirées par produit (une requête agrégée), sans la
+    réservation `exclude_token` de `user` (un jeton ne vaut que pour qui l'a créé)
+    """
+    from django.db.models import Sum
+    from django.utils import timezone
+    
+    reservations = StockReservation.objects.filter(product_id__in=product_ids, expires_at__gt=timezone.now())
+    if exclude_token:
+        reservations = reservations.exclude(token=exclude_token, created_by=user)
+    return dict(
+        reservations.order_by().values('product_id').annotate(held=Sum('quantity')).values_list('product_id', 'held')
+    )
+
+
+def _lock_stocks(product_ids):
+    """Lit les stocks à jour des produits en verrouillant leurs lignes (une requête)"""
+    return dict(
+        Product.objects.select_for_update()
+        .filter(id__in=product_ids)
+        .values_list('id', 'stock')
+    )
+
+
+def _apply_lines(lines, stocks, held=None):
+    """
+    Applique les lignes dans l'ordre sur les stocks en mémoire : la vente prend au plus
+    le stock disponible (stock moins les quantités `held` réservées par d'autres paniers),
+    le reste est retourné comme surplus sous forme de liste (produit, surplus).
+    Le stock réservé n'est jamais entamé et le stock ne descend jamais sous 0.
+    """
+    held = held or {}
+    surpluses = []
+    for line in lines:
+        product = line['product']
+        quantity = line['quantity']
+        current_stock = stocks.get(product.id, 0)
+        available = max(current_stock - held.get(product.id, 0), 0)
+        taken = min(quantity, available)
+        stocks[product.id] = current_stock - taken
+        if taken < quantity:
+            # Stock insuffisant : enregistrer le surplus
+            surpluses.append((product, quantity - taken))
+    return surpluses
+
+
+def _sale_reference(sale):
+    return f"Vente #{sale.id}"
+
+
+def _out_of_stock_record(sale, product, surplus):
+    return OutOfStockSale(
+        product=product,
+        quantity_sold=surplus,
+        sale=sale,
+        notes=f"{product.name} {surplus} pièces vendues hors stock"
+    )
+
+
+def _out_of_stock_info(surpluses):
+    return [{'product': product.name, 'quantity': surplus} for product, surplus in surpluses]
+
+
+def _deduct_stock(sale, lines):
+    """
+    Déduit les stocks des produits vendus en verrouillant leurs lignes une seule fois,
+    en tenant compte des réservations actives, puis enregistre les surplus comme ventes hors stock en une seule insertion.
+    Retourne la liste `out_of_stock_info` ({'product', 'quantity'}).
+    """
+    from django.db import transaction
+    
+    if not lines:
+        return []
+    
+    product_ids = {line['product'].id for line in lines}
+    stocks = _lock_stocks(product_ids)
+    initial = dict(stocks)
+    # Les quantités réservées par d'autres paniers ne sont pas disponibles : elles
+    # limitent ce que la vente prend, la variation est calculée sur le stock réel
+    surpluses = _apply_lines(lines, stocks, held_quantities(product_ids))
+    apply_stock_deltas(
+        {product_id: stocks[product_id] - initial.get(product_id, 0) for product_id in stocks},
+        'sale', _sale_reference(sale), sale.created_by, locked_stocks=initial
+    )
+    
+    # Enregistrer les ventes hors stock en une seule insertion
+    if surpluses:
+        try:
+            with transaction.atomic():
+                OutOfStockSale.objects.bulk_create([
+                    _out_of_stock_record(sale, product, surplus) for product, surplus in surpluses
+                ])
+        except Exception as e:
+            # Si l'enregistrement échoue, on continue quand même
+            # mais on log l'erreur
+            logger.error(f"Erreur lors de l'enregistrement de la vente hors stock: {e}")
+            return []
+    
+    return _out_of_stock_info(surpluses)
+
+
+def _restock_and_deduct(sale, old_items, lines, user=None):
+    """
+    Remet en stock les anciens items puis applique les nouvelles lignes, en mémoire,
+    et n'écrit que la variation nette par produit. Comme à la création, les quantités
+    réservées par des paniers ne sont pas prises. Les ventes hors stock existantes
+    ne sont supprimées ou créées que si elles diffèrent du nouveau calcul.
+    """
+    product_ids = {item.product_id for item in old_items} | {line['product'].id for line in lines}
+    if not product_ids:
+        return []
+    
+    stocks = _lock_stocks(product_ids)
+    initial = dict(stocks)
+    for item in old_items:
+        stocks[item.product_id] = stocks.get(item.product_id, 0) + item.quantity
+    surpluses = _apply_lines(lines, stocks, held_quantities(product_ids))
+    apply_stock_deltas(
+        {product_id: stocks[product_id] - initial.get(product_id, 0) for product_id in stocks},
+        'sale_update', _sale_reference(sale), user, locked_stocks=initial
+    )
+    
+    # Conserver les enregistrements hors stock identiques, remplacer les autres
+    existing = {}
+    for record in OutOfStockSale.objects.filter(sale=sale).only('id', 'product_id', 'quantity_sold'):
+        existing.setdefault((record.product_id, record.quantity_sold), []).append(record.id)
+    to_create = []
+    for product, surplus in surpluses:
+        matching = existing.get((product.id, surplus))
+        if matching:
+            matching.pop()
+        else:
+            to_create.append(_out_of_stock_record(sale, product, surplus))
+    stale_ids = [record_id for ids in existing.values() for record_id in ids]
+    if stale_ids:
+        OutOfStockSale.objects.filter(id__in=stale_ids).delete()
+    if to_create:
+        OutOfStockSale.objects.bulk_create(to_create)
+    
+    return _out_of_stock_info(surpluses)
+
+
+def _reconcile_items(sale, old_items, lines):
+    """
+    Compare les anciens items et les nouvelles lignes produit par produit :
+    les items identiques sont conservés, les modifiés mis à jour en une requête,
+    les supprimés effacés et les nouveaux insérés en une seule fois.
+    """
+    old_by_product = {}
+    for item in old_items:
+        old_by_product.setdefault(item.product_id, []).append(item)
+    
+    to_update = []
+    to_create = []
+    for line in lines:
+        candidates = old_by_product.get(line['product'].id)
+        if candidates:
+            item = candidates.pop(0)
+            if item.quantity != line['quantity'] or item.unit_price != line['unit_price']:
+                item.quantity = line['quantity']
+                item.unit_price = line['unit_price']
+                to_update.append(item)
+        else:
+            to_create.append(SaleItem(
+                sale=sale, product=line['product'], quantity=line['quantity'], unit_price=line['unit_price']
+            ))
+    
+    to_delete = [item.id for items in old_by_product.values() for item in items]
+    if to_delete:
+        SaleItem.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        SaleItem.objects.bulk_update(to_update, ['quantity', 'unit_price'])
+    if to_create:
+        SaleItem.objects.bulk_create(to_create)
@@ -1,3 +1,568 @@
-from django.test import TestCase
+import io
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.models import User
+from customers.models import Customer
+from products.models import Product
+from .models import Sale, SaleItem, OutOfStockSale, StockReservation, DailySalesSummary, DailyProductSales
+
+
+class SaleListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        self.product = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=100)
+
+    def _create_sales(self, count):
+        for _ in range(count):
+            sale = Sale.objects.create(customer=self.customer, total_amount=Decimal('5000.00'))
+            SaleItem.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('2500.00'))
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/sales/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_payload(self):
+        self._create_sales(1)
+        _, response = self._count_list_queries()
+        sale = response.data[0]
+        self.assertEqual(sale['customer_name'], 'Awa Traoré')
+        self.assertEqual(sale['total_amount'], '5000.00')
+        self.assertEqual(sale['payment_method_display'], 'Espèces')
+        self.assertEqual(sale['items_count'], 1)
+        self.assertEqual(sale['items'][0], {
+            'id': SaleItem.objects.get().id,
+            'product': self.product.id,
+            'product_name': 'Radio',
+            'quantity': 2,
+            'unit_price': '2500.00',
+            'subtotal': '5000.00',
+        })
+
+    def test_list_query_count_is_constant(self):
+        self._create_sales(3)
+        small_count, _ = self._count_list_queries()
+        self._create_sales(20)
+        large_count, response = self._count_list_queries()
+        self.assertEqual(len(response.data), 23)
+        self.assertEqual(small_count, large_count)
+
+    def test_full_list_loads_items_in_bounded_chunks(self):
+        # Une liste complète ne doit jamais lier un paramètre par vente dans une seule
+        # requête (limite de variables de SQLite) : les items sont lus par paquets
+        self._create_sales(25)
+        with mock.patch('sales.views.STREAM_CHUNK_SIZE', 10):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/api/sales/')
+        self.assertEqual(len(response.data), 25)
+        self.assertTrue(all(sale['items_count'] == 1 for sale in response.data))
+        item_queries = [query['sql'] for query in ctx.captured_queries if 'FROM "sales_saleitem"' in query['sql']]
+        self.assertEqual(len(item_queries), 3)
+
+    def test_list_cursor_pagination(self):
+        self._create_sales(5)
+        response = self.client.get('/api/sales/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        seen = [sale['id'] for sale in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            seen += [sale['id'] for sale in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(seen, list(Sale.objects.order_by('-sale_date', '-pk').values_list('id', flat=True)))
+
+    def test_list_ndjson_stream(self):
+        self._create_sales(3)
+        response = self.client.get('/api/sales/', {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(records, self.client.get('/api/sales/').json())
+
+
+class SaleExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+        lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=10)
+        for quantity in (1, 2, 3):
+            self.client.post('/api/sales/', {
+                'payment_method': 'card',
+                'items': [
+                    {'product': radio.id, 'quantity': quantity, 'unit_price': '2500.00'},
+                    {'product': lampe.id, 'quantity': 1, 'unit_price': '1000.00'},
+                ],
+            }, format='json')
+
+    def test_xlsx_export_in_constant_queries(self):
+        from openpyxl import load_workbook
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/sales/export_report/')
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('rapport_ventes_all_all.xlsx', response['Content-Disposition'])
+        rows = list(load_workbook(io.BytesIO(content)).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][3], 'Produit')
+        self.assertEqual(len(rows), 1 + 6 + 2)
+        self.assertEqual(rows[1][3:], ('Radio', 1, 2500.0, 2500.0, 'Carte bancaire'))
+        self.assertEqual(rows[-1][0], 'TOTAL GÉNÉRAL')
+        self.assertEqual(rows[-1][6], 18000.0)
+
+    def test_csv_export_streams_same_columns_and_total(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/sales/export_report/', {'format': 'csv'})
+            content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('rapport_ventes_all_all.csv', response['Content-Disposition'])
+        lines = content.lstrip('\ufeff').splitlines()
+        self.assertEqual(lines[0], 'Date;Heure;ID Vente;Produit;Quantité;Prix Unitaire;Total;Méthode de Paiement')
+        self.assertTrue(lines[1].endswith(';Radio;1;2500.00;2500.00;Carte bancaire'))
+        self.assertEqual(len(lines), 1 + 6 + 2)
+        self.assertEqual(lines[-1], 'TOTAL GÉNÉRAL;;;;;;18000.00;')
+
+
+class SaleCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=2)
+
+    def test_create_deducts_stock_and_records_surplus(self):
+        response = self.client.post('/api/sales/', {
+            'payment_method': 'cash',
+            'items': [
+                {'product': self.radio.id, 'quantity': 3, 'unit_price': '2500.00'},
+                {'product': self.lampe.id, 'quantity': 4, 'unit_price': '1000.00'},
+                {'product': self.radio.id, 'quantity': 3, 'unit_price': '2500.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['out_of_stock_info'], [
+            {'product': 'Lampe', 'quantity': 2},
+            {'product': 'Radio', 'quantity': 1},
+        ])
+        self.radio.refresh_from_db()
+        self.lampe.refresh_from_db()
+        self.assertEqual((self.radio.stock, self.lampe.stock), (0, 0))
+        sale = Sale.objects.get()
+        self.assertEqual(sale.total_amount, Decimal('19000.00'))
+        self.assertEqual(sale.items.count(), 3)
+        self.assertEqual(OutOfStockSale.objects.filter(sale=sale).count(), 2)
+
+
+class SaleUpdateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=10)
+        self.pile = Product.objects.create(name='Pile', price=Decimal('200.00'), stock=1)
+        self.client.post('/api/sales/', {
+            'items': [
+                {'product': self.radio.id, 'quantity': 2, 'unit_price': '2500.00'},
+                {'product': self.lampe.id, 'quantity': 3, 'unit_price': '1000.00'},
+            ],
+        }, format='json')
+        self.sale = Sale.objects.get()
+        self.items = {item.product_id: item for item in self.sale.items.all()}
+
+    def _stocks(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_update_only_touches_changed_items(self):
+        response = self.client.put(f'/api/sales/{self.sale.id}/', {
+            'payment_method': 'card',
+            'items': [
+                {'product': self.radio.id, 'quantity': 2, 'unit_price': '2500.00'},
+                {'product': self.lampe.id, 'quantity': 1, 'unit_price': '1000.00'},
+                {'product': self.pile.id, 'quantity': 3, 'unit_price': '200.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['out_of_stock_info'], [{'product': 'Pile', 'quantity': 2}])
+        self.assertEqual(self._stocks(), {'Radio': 8, 'Lampe': 9, 'Pile': 0})
+        items = {item.product_id: item for item in self.sale.items.all()}
+        self.assertEqual(items[self.radio.id].id, self.items[self.radio.id].id)
+        self.assertEqual(items[self.lampe.id].id, self.items[self.lampe.id].id)
+        self.assertEqual(items[self.lampe.id].quantity, 1)
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.total_amount, Decimal('6600.00'))
+        self.assertEqual(self.sale.payment_method, 'card')
+
+    def test_update_removing_item_restores_stock(self):
+        self.client.put(f'/api/sales/{self.sale.id}/', {
+            'items': [{'product': self.lampe.id, 'quantity': 3, 'unit_price': '1000.00'}],
+        }, format='json')
+        self.assertEqual(self._stocks(), {'Radio': 10, 'Lampe': 7, 'Pile': 1})
+        self.assertEqual(self.sale.items.count(), 1)
+
+
+class DailySalesSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+
+    def _summary(self):
+        summary = DailySalesSummary.objects.get(day=timezone.localdate())
+        return summary.revenue, summary.sale_count, summary.units, summary.cash_amount, summary.card_amount
+
+    def test_rollup_follows_create_update_and_delete(self):
+        response = self.client.post('/api/sales/', {
+            'payment_method': 'cash',
+            'items': [{'product': self.radio.id, 'quantity': 2, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        sale_id = Sale.objects.get().id
+        self.assertEqual(self._summary(), (Decimal('5000.00'), 1, 2, Decimal('5000.00'), Decimal('0.00')))
+
+        self.client.put(f'/api/sales/{sale_id}/', {
+            'payment_method': 'card',
+            'items': [{'product': self.radio.id, 'quantity': 3, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(self._summary(), (Decimal('7500.00'), 1, 3, Decimal('0.00'), Decimal('7500.00')))
+
+        self.client.delete(f'/api/sales/{sale_id}/')
+        self.assertEqual(self._summary(), (Decimal('0.00'), 0, 0, Decimal('0.00'), Decimal('0.00')))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for quantity in (1, 4):
+            self.client.post('/api/sales/', {
+                'items': [{'product': self.radio.id, 'quantity': quantity, 'unit_price': '2500.00'}],
+            }, format='json')
+        incremental = self._summary()
+        DailySalesSummary.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self._summary(), incremental)
+
+
+class SaleAdminRollupTests(APITestCase):
+    def setUp(self):
+        from django.test import Client
+        
+        self.admin = User.objects.create_superuser(username='admin', password='secret')
+        self.browser = Client()
+        self.browser.force_login(self.admin)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=10)
+
+    def _form(self, total, payment_method, items, item_ids=()):
+        data = {
+            'customer': '', 'total_amount': total, 'payment_method': payment_method, 'notes': '',
+            'created_by': self.admin.id, 'items-TOTAL_FORMS': str(len(items)), 'items-INITIAL_FORMS': str(len(item_ids)),
+            'items-MIN_NUM_FORMS': '0', 'items-MAX_NUM_FORMS': '1000',
+        }
+        for index, (product, quantity, unit_price) in enumerate(items):
+            data.update({
+                f'items-{index}-product': product.id, f'items-{index}-quantity': quantity,
+                f'items-{index}-unit_price': unit_price,
+            })
+            if index < len(item_ids):
+                data[f'items-{index}-id'] = item_ids[index]
+        return data
+
+    def _rollups(self):
+        days = list(
+            DailySalesSummary.objects.exclude(sale_count=0).order_by('day')
+            .values_list('day', 'revenue', 'sale_count', 'units', 'cash_amount', 'card_amount')
+        )
+        products = list(
+            DailyProductSales.objects.exclude(sale_count=0).order_by('day', 'product_id')
+            .values_list('day', 'product_id', 'revenue', 'units', 'sale_count')
+        )
+        return days, products
+
+    def _assert_matches_rebuild(self):
+        incremental = self._rollups()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_admin_writes_update_rollups(self):
+        response = self.browser.post('/admin/sales/sale/add/', self._form(
+            '6000.00', 'cash', [(self.radio, 2, '2500.00'), (self.lampe, 1, '1000.00')]
+        ))
+        self.assertEqual(response.status_code, 302)
+        sale = Sale.objects.get()
+        self.assertEqual(self._rollups()[0][0][1:4], (Decimal('6000.00'), 1, 3))
+        self._assert_matches_rebuild()
+
+        item_ids = list(sale.items.order_by('id').values_list('id', flat=True))
+        self.browser.post(f'/admin/sales/sale/{sale.id}/change/', self._form(
+            '7500.00', 'card', [(self.radio, 3, '2500.00')], item_ids[:1]
+        ))
+        self.assertEqual(self._rollups()[0][0][1:], (Decimal('7500.00'), 1, 4, Decimal('0.00'), Decimal('7500.00')))
+        self._assert_matches_rebuild()
+
+        item = sale.items.get(product=self.radio)
+        self.browser.post(f'/admin/sales/saleitem/{item.id}/change/', {
+            'sale': sale.id, 'product': self.radio.id, 'quantity': 5, 'unit_price': '2500.00',
+        })
+        self.assertEqual(self._rollups()[1][0][3], 5)
+        self._assert_matches_rebuild()
+
+        self.browser.post('/admin/sales/sale/', {
+            'action': 'delete_selected', '_selected_action': [sale.id], 'post': 'yes',
+        })
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(self._rollups(), ([], []))
+
+
+class SalesAnalyticsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=10)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=10)
+        for payment_method, items in (
+            ('cash', [(self.radio, 2), (self.lampe, 1)]),
+            ('card', [(self.lampe, 3)]),
+        ):
+            self.client.post('/api/sales/', {
+                'payment_method': payment_method,
+                'items': [
+                    {'product': product.id, 'quantity': quantity, 'unit_price': str(product.price)}
+                    for product, quantity in items
+                ],
+            }, format='json')
+
+    def test_group_by_product(self):
+        response = self.client.get('/api/analytics/sales/', {'dimension': 'product'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.radio.id, 'label': 'Radio', 'revenue': 5000.0, 'units': 2, 'tickets': 1},
+            {'id': self.lampe.id, 'label': 'Lampe', 'revenue': 4000.0, 'units': 4, 'tickets': 2},
+        ])
+
+    def test_group_by_day_and_payment_method(self):
+        today = timezone.localdate().isoformat()
+        response = self.client.get('/api/analytics/sales/', {'period': 'day', 'dimension': 'payment_method'})
+        self.assertEqual(response.data['results'], [
+            {'period': today, 'id': 'cash', 'label': 'Espèces', 'revenue': 6000.0, 'units': 3, 'tickets': 1},
+            {'period': today, 'id': 'card', 'label': 'Carte bancaire', 'revenue': 3000.0, 'units': 3, 'tickets': 1},
+        ])
+
+    def test_totals_by_month_come_from_rollups(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/sales/', {'period': 'month'})
+        self.assertEqual(response.data['results'], [{
+            'period': timezone.localdate().replace(day=1).isoformat(),
+            'revenue': 9000.0, 'units': 6, 'tickets': 2,
+        }])
+
+    def test_rejects_unknown_dimension(self):
+        response = self.client.get('/api/analytics/sales/', {'dimension': 'color'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductABCTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.products = {
+            name: Product.objects.create(name=name, price=price, stock=100)
+            for name, price in (('Radio', Decimal('7000.00')), ('Lampe', Decimal('2000.00')), ('Pile', Decimal('1000.00')))
+        }
+        for name in self.products:
+            self._sell(name, 1)
+
+    def _sell(self, name, quantity):
+        product = self.products[name]
+        return self.client.post('/api/sales/', {
+            'items': [{'product': product.id, 'quantity': quantity, 'unit_price': str(product.price)}],
+        }, format='json')
+
+    def test_ranks_and_classifies_by_cumulative_share(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytics/abc/')
+        results = response.data['results']
+        # Le produit qui franchit le seuil reste dans la classe du seuil
+        self.assertEqual([(row['label'], row['class']) for row in results], [('Radio', 'A'), ('Lampe', 'A'), ('Pile', 'B')])
+        self.assertEqual([row['cumulative_share'] for row in results], [70.0, 90.0, 100.0])
+
+        response = self.client.get('/api/analytics/abc/', {'a': 60, 'b': 80})
+        self.assertEqual([row['class'] for row in response.data['results']], ['A', 'B', 'C'])
+
+    def test_table_follows_sale_updates_and_deletes(self):
+        self._sell('Pile', 9)
+        sale = Sale.objects.order_by('-id').first()
+        self.client.put(f'/api/sales/{sale.id}/', {
+            'items': [{'product': self.products['Pile'].id, 'quantity': 4, 'unit_price': '1000.00'}],
+        }, format='json')
+        row = DailyProductSales.objects.get(product=self.products['Pile'])
+        self.assertEqual((row.units, row.revenue, row.sale_count), (5, Decimal('5000.00'), 2))
+
+        response = self.client.get('/api/analytics/abc/', {'metric': 'units'})
+        self.assertEqual(response.data['results'][0]['label'], 'Pile')
+
+        self.client.delete(f'/api/sales/{sale.id}/')
+        row.refresh_from_db()
+        self.assertEqual((row.units, row.revenue, row.sale_count), (1, Decimal('1000.00'), 1))
+
+    def test_rebuild_matches_incremental_table(self):
+        incremental = set(DailyProductSales.objects.values_list('day', 'product_id', 'units', 'revenue', 'sale_count'))
+        DailyProductSales.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        rebuilt = set(DailyProductSales.objects.values_list('day', 'product_id', 'units', 'revenue', 'sale_count'))
+        self.assertEqual(rebuilt, incremental)
+
+
+class SaleBatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=3)
+
+    def test_batch_applies_sales_in_order(self):
+        response = self.client.post('/api/sales/batch/', {'sales': [
+            {'reference': 'pos-1', 'items': [{'product': self.radio.id, 'quantity': 2}]},
+            {'reference': 'pos-2', 'payment_method': 'card',
+             'items': [{'product': self.radio.id, 'quantity': 2, 'unit_price': '2000.00'}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual([r['reference'] for r in results], ['pos-1', 'pos-2'])
+        self.assertEqual(results[0]['out_of_stock_info'], [])
+        self.assertEqual(results[1]['out_of_stock_info'], [{'product': 'Radio', 'quantity': 1}])
+        self.assertEqual(results[0]['total_amount'], '5000.00')
+        self.radio.refresh_from_db()
+        self.assertEqual(self.radio.stock, 0)
+        self.assertEqual(Sale.objects.filter(created_by=self.user).count(), 2)
+        self.assertEqual(SaleItem.objects.count(), 2)
+
+    def test_batch_rejects_unknown_product(self):
+        response = self.client.post('/api/sales/batch/', {'sales': [
+            {'items': [{'product': self.radio.id, 'quantity': 1}]},
+            {'items': [{'product': 999, 'quantity': 1}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1', response.json()['sales'])
+        self.assertEqual(Sale.objects.count(), 0)
+
+
+class CheckStockTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='caissier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.radio = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=5)
+        self.lampe = Product.objects.create(name='Lampe', price=Decimal('1000.00'), stock=1)
+
+    def _check(self, items, **extra):
+        return self.client.post('/api/sales/check_stock/', {'items': items, **extra}, format='json').data
+
+    def test_reports_shortages_in_constant_queries(self):
+        items = [
+            {'product': self.radio.id, 'quantity': 2},
+            {'product': self.lampe.id, 'quantity': 3},
+            {'product': 999, 'quantity': 1},
+        ]
+        with self.assertNumQueries(2):
+            data = self._check(items)
+        self.assertTrue(data['has_issues'])
+        self.assertEqual([issue['shortage'] for issue in data['issues']], [2, 1])
+        self.assertEqual(data['issues'][1]['product_name'], 'Produit introuvable')
+
+    def test_reservation_holds_stock_until_sale(self):
+        data = self._check([{'product': self.radio.id, 'quantity': 4}], reserve=True)
+        token = data['reservation']['token']
+        # Un autre panier ne voit plus que le stock non réservé
+        other = self._check([{'product': self.radio.id, 'quantity': 2}])
+        self.assertEqual(other['issues'][0]['available'], 1)
+        # La vente qui consomme la réservation n'est pas en rupture
+        response = self.client.post('/api/sales/', {
+            'reservation': token,
+            'items': [{'product': self.radio.id, 'quantity': 4, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(response.data['out_of_stock_info'], [])
+        self.assertFalse(StockReservation.objects.exists())
+        self.radio.refresh_from_db()
+        self.assertEqual(self.radio.stock, 1)
+
+    def test_sale_cannot_take_reserved_stock(self):
+        self._check([{'product': self.radio.id, 'quantity': 4}], reserve=True)
+        response = self.client.post('/api/sales/', {
+            'items': [{'product': self.radio.id, 'quantity': 3, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(response.data['out_of_stock_info'], [{'product': 'Radio', 'quantity': 2}])
+        self.radio.refresh_from_db()
+        self.assertEqual(self.radio.stock, 4)
+
+    def test_token_of_another_till_does_not_release_its_hold(self):
+        token = self._check([{'product': self.radio.id, 'quantity': 4}], reserve=True)['reservation']['token']
+        other = User.objects.create_user(username='caisse2', password='secret')
+        self.client.force_authenticate(other)
+        # Le jeton d'une autre caisse ne rend pas son stock réservé disponible
+        check = self._check([{'product': self.radio.id, 'quantity': 2}], reservation=token)
+        self.assertEqual(check['issues'][0]['available'], 1)
+        response = self.client.post('/api/sales/', {
+            'reservation': token,
+            'items': [{'product': self.radio.id, 'quantity': 3, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(response.data['out_of_stock_info'], [{'product': 'Radio', 'quantity': 2}])
+        self.assertEqual(StockReservation.objects.get(token=token).created_by, self.user)
+
+    def test_reservation_larger_than_stock(self):
+        from products.models import StockMovement
+        
+        # La réservation est plafonnée au stock disponible
+        self._check([{'product': self.radio.id, 'quantity': 100}], reserve=True)
+        self.assertEqual(StockReservation.objects.get().quantity, 5)
+        # Réservation devenue supérieure au stock (stock réduit depuis) : la vente ne prend
+        # rien, le stock ne bouge pas et le journal n'enregistre aucun mouvement
+        StockReservation.objects.update(quantity=100)
+        response = self.client.post('/api/sales/', {
+            'items': [{'product': self.radio.id, 'quantity': 2, 'unit_price': '2500.00'}],
+        }, format='json')
+        self.assertEqual(response.data['out_of_stock_info'], [{'product': 'Radio', 'quantity': 2}])
+        self.radio.refresh_from_db()
+        self.assertEqual(self.radio.stock, 5)
+        self.assertFalse(StockMovement.objects.filter(product=self.radio, reason='sale').exists())
+
+
+class PurgeSalesCommandTests(APITestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Awa', last_name='Traoré')
+        self.product = Product.objects.create(name='Radio', price=Decimal('2500.00'), stock=0)
+        for customer in (self.customer, None, self.customer):
+            sale = Sale.objects.create(customer=customer, total_amount=Decimal('5000.00'))
+            SaleItem.objects.create(sale=sale, product=self.product, quantity=2, unit_price=Decimal('2500.00'))
+            OutOfStockSale.objects.create(sale=sale, product=self.product, quantity_sold=2)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('purge_sales', '--dry-run', stdout=out)
+        self.assertIn('3 vente(s)', out.getvalue())
+        self.assertEqual(Sale.objects.count(), 3)
+
+    def test_purge_by_customer_in_chunks_restores_stock(self):
+        today = timezone.now().date().isoformat()
+        call_command(
+            'purge_sales', '--from', today, '--to', today, '--customer', str(self.customer.id),
+            '--chunk-size', '1', '--confirm', stdout=StringIO()
+        )
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(SaleItem.objects.count(), 1)
+        self.assertEqual(OutOfStockSale.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_purge_updates_daily_rollup(self):
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('purge_sales', '--customer', str(self.customer.id), '--confirm', stdout=StringIO())
+        summary = DailySalesSummary.objects.get()
+        self.assertEqual((summary.revenue, summary.sale_count, summary.units), (Decimal('5000.00'), 1, 2))
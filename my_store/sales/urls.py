@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SaleViewSet, OutOfStockSaleListView
+from .views import SaleViewSet, OutOfStockSaleListView, SalesAnalyticsView, ProductABCView
 
 router = DefaultRouter()
 router.register(r'sales', SaleViewSet, basename='sale')
@@ -8,5 +8,7 @@ router.register(r'sales', SaleViewSet, basename='sale')
 urlpatterns = [
     path('', include(router.urls)),
     path('out-of-stock-sales/', OutOfStockSaleListView.as_view(), name='out-of-stock-sales'),
+    path('analytics/sales/', SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('analytics/abc/', ProductABCView.as_view(), name='product-abc'),
 ]
 
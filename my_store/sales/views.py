@@ -2,22 +2,50 @@ from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
-from django.db.models import Sum, Count
-from datetime import datetime
-import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from rest_framework.views import APIView
+from django.db.models import Sum, Count, CharField
+from django.db.models.functions import Cast
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from rest_framework.settings import api_settings
+from core.conditional import ConditionalGetMixin
+from core.idempotency import IdempotentCreateMixin
+from my_store.exports import CSVRenderer
+from my_store.streaming import NDJSONRenderer, STREAM_CHUNK_SIZE, streaming_mode, streaming_response
+from . import rollups
 from .models import Sale, SaleItem, OutOfStockSale
+from .reports import sales_report
 from .serializers import (
     SaleSerializer, SaleCreateSerializer, SaleListSerializer, 
-    SaleUpdateSerializer, SaleItemSerializer, OutOfStockSaleSerializer
+    SaleUpdateSerializer, SaleItemSerializer, OutOfStockSaleSerializer,
+    SaleBatchSerializer
 )
 
 
-class SaleViewSet(viewsets.ModelViewSet):
+def _safe_decimal(value):
+    """Convertit une valeur brute en Decimal, 0.00 si elle est invalide"""
+    if value is None:
+        return Decimal('0.00')
+    try:
+        result = Decimal(str(value))
+    except (ValueError, InvalidOperation, TypeError):
+        return Decimal('0.00')
+    return result if result.is_finite() else Decimal('0.00')
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class SaleViewSet(IdempotentCreateMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all()
     permission_classes = [IsAuthenticated]
+    # Nom du client et des produits affichés dans les ventes
+    etag_models = ('customers.Customer', 'products.Product')
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CSVRenderer]
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -26,6 +54,8 @@ class SaleViewSet(viewsets.ModelViewSet):
             return SaleListSerializer
         elif self.action in ['update', 'partial_update']:
             return SaleUpdateSerializer
+        elif self.action == 'batch':
+            return SaleBatchSerializer
         return SaleSerializer
 
     def get_queryset(self):
@@ -52,122 +82,29 @@ class SaleViewSet(viewsets.ModelViewSet):
         return queryset
     
     def list(self, request, *args, **kwargs):
-        """Surcharge pour gérer les erreurs de conversion Decimal en utilisant values()"""
+        # Répondre 304 avant de lire les ventes si le client a déjà cette version
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(request, queryset, lambda: self._list_sales(request, queryset))
+
+    def _list_sales(self, request, queryset):
+        """Surcharge pour gérer les erreurs de conversion Decimal avec un nombre constant de requêtes"""
         import logging
-        from rest_framework.response import Response
-        from rest_framework import status
-        from decimal import Decimal, InvalidOperation
         
         logger = logging.getLogger(__name__)
         
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            sale_rows = self._sale_rows(queryset)
             
-            # Récupérer uniquement les IDs pour éviter toute conversion Decimal lors de values()
-            sale_ids = list(queryset.values_list('id', flat=True))
+            # Export en flux (?format=ndjson ou ?stream=1) pour les synchronisations complètes
+            mode = streaming_mode(request)
+            if mode:
+                return streaming_response(self._iter_sales_payload(sale_rows), mode)
             
-            sales_data = []
-            for sale_id in sale_ids:
-                try:
-                    # Récupérer la vente complète en utilisant only() pour éviter de charger total_amount immédiatement
-                    # On le chargera manuellement avec gestion d'erreur
-                    sale = Sale.objects.only(
-                        'id', 'customer_id', 'sale_date', 'payment_method', 
-                        'notes', 'created_at', 'customer'
-                    ).get(id=sale_id)
-                    
-                    # Charger total_amount séparément avec gestion d'erreur
-                    # Utiliser une requête SQL brute pour éviter la conversion Decimal
-                    try:
-                        from django.db import connection
-                        with connection.cursor() as cursor:
-                            cursor.execute("SELECT total_amount FROM sales_sale WHERE id = %s", [sale_id])
-                            row = cursor.fetchone()
-                            if row and row[0] is not None:
-                                try:
-                                    # Essayer de convertir en Decimal
-                                    total_amount_str = str(Decimal(str(row[0])).quantize(Decimal('0.01')))
-                                except (ValueError, InvalidOperation, TypeError):
-                                    total_amount_str = '0.00'
-                            else:
-                                total_amount_str = '0.00'
-                    except Exception as e:
-                        logger.error(f"Erreur lors de la récupération de total_amount pour la vente {sale_id}: {e}")
-                        total_amount_str = '0.00'
-                    
-                    # Charger les items sans unit_price pour éviter la conversion Decimal
-                    # On récupérera unit_price directement depuis l'objet
-                    items_ids = sale.items.values_list('id', flat=True)
-                    items_data = []
-                    
-                    for item_id in items_ids:
-                        try:
-                            # Récupérer l'item complet
-                            from .models import SaleItem
-                            item = SaleItem.objects.filter(id=item_id).first()
-                            if not item:
-                                continue
-                            
-                            # Récupérer le produit
-                            from products.models import Product
-                            product = item.product
-                            
-                            # Gérer unit_price directement depuis l'objet avec gestion d'erreur
-                            try:
-                                unit_price_attr = item.unit_price
-                                if unit_price_attr is None:
-                                    unit_price = Decimal('0.00')
-                                elif isinstance(unit_price_attr, Decimal):
-                                    unit_price = unit_price_attr
-                                else:
-                                    unit_price = Decimal(str(unit_price_attr))
-                            except (ValueError, InvalidOperation, TypeError, AttributeError):
-                                unit_price = Decimal('0.00')
-                            
-                            quantity = item.quantity if item.quantity is not None else 0
-                            try:
-                                quantity = int(quantity)
-                            except (ValueError, TypeError):
-                                quantity = 0
-                            
-                            subtotal = Decimal(str(quantity)) * unit_price
-                            
-                            items_data.append({
-                                'id': item.id,
-                                'product': product.id if product else None,
-                                'product_name': product.name if product else '-',
-                                'quantity': quantity,
-                                'unit_price': str(unit_price.quantize(Decimal('0.01'))),
-                                'subtotal': str(subtotal.quantize(Decimal('0.01')))
-                            })
-                        except Exception as item_error:
-                            logger.error(f"Erreur avec l'item {item_id}: {item_error}", exc_info=True)
-                            continue
-                    
-                    # Construire les données de la vente
-                    customer = sale.customer
-                    # total_amount_str a déjà été récupéré plus haut avec gestion d'erreur
-                    
-                    sale_data = {
-                        'id': sale.id,
-                        'customer': sale.customer_id,
-                        'customer_name': customer.full_name if customer else None,
-                        'sale_date': sale.sale_date.isoformat() if sale.sale_date else None,
-                        'total_amount': total_amount_str,
-                        'payment_method': sale.payment_method,
-                        'payment_method_display': sale.get_payment_method_display() if hasattr(sale, 'get_payment_method_display') else sale.payment_method,
-                        'notes': sale.notes or '',
-                        'items': items_data,
-                        'items_count': len(items_data),
-                        'created_at': sale.created_at.isoformat() if sale.created_at else None,
-                    }
-                    sales_data.append(sale_data)
-                    
-                except Exception as sale_error:
-                    logger.error(f"Erreur avec la vente {sale_id}: {sale_error}", exc_info=True)
-                    continue
+            page = self.paginate_queryset(sale_rows)
+            if page is not None:
+                return self.get_paginated_response(self._build_sales_payload(page))
             
-            return Response(sales_data)
+            return Response(self._build_sales_payload(list(sale_rows)))
             
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des ventes: {e}", exc_info=True)
@@ -176,6 +113,91 @@ class SaleViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _sale_rows(self, queryset):
+        """
+        Lignes de ventes (+ client) sous forme de dictionnaires.
+        Le montant est lu en texte (CAST) pour éviter les erreurs de conversion Decimal.
+        """
+        return queryset.annotate(
+            total_amount_raw=Cast('total_amount', output_field=CharField())
+        ).values(
+            'id', 'customer_id', 'customer__first_name', 'customer__last_name',
+            'sale_date', 'total_amount_raw', 'payment_method', 'notes', 'created_at',
+        )
+
+    def _iter_sales_payload(self, sale_rows):
+        """Produit les ventes paquet par paquet (une requête d'items par paquet)"""
+        chunk = []
+        for row in sale_rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield from self._build_sales_payload(chunk)
+                chunk = []
+        if chunk:
+            yield from self._build_sales_payload(chunk)
+
+    def _collect_items(self, sale_ids, items_by_sale):
+        """Ajoute à `items_by_sale` les items (+ produit) des ventes `sale_ids`, en une requête"""
+        item_rows = SaleItem.objects.filter(
+            sale_id__in=sale_ids
+        ).annotate(
+            unit_price_raw=Cast('unit_price', output_field=CharField())
+        ).values(
+            'id', 'sale_id', 'product_id', 'product__name', 'quantity', 'unit_price_raw'
+        ).order_by('sale_id', 'id')
+        
+        for item in item_rows:
+            unit_price = _safe_decimal(item['unit_price_raw'])
+            try:
+                quantity = int(item['quantity']) if item['quantity'] is not None else 0
+            except (ValueError, TypeError):
+                quantity = 0
+            subtotal = Decimal(str(quantity)) * unit_price
+            items_by_sale.setdefault(item['sale_id'], []).append({
+                'id': item['id'],
+                'product': item['product_id'],
+                'product_name': item['product__name'] if item['product_id'] else '-',
+                'quantity': quantity,
+                'unit_price': str(unit_price.quantize(Decimal('0.01'))),
+                'subtotal': str(subtotal.quantize(Decimal('0.01')))
+            })
+
+    def _build_sales_payload(self, sale_rows):
+        """
+        Construit la liste des ventes à partir des lignes de `_sale_rows`,
+        en chargeant les items + produits par paquets de STREAM_CHUNK_SIZE ventes
+        (une requête par paquet, sous la limite de paramètres de SQLite).
+        """
+        if not sale_rows:
+            return []
+        
+        sale_ids = [row['id'] for row in sale_rows]
+        items_by_sale = {}
+        for start in range(0, len(sale_ids), STREAM_CHUNK_SIZE):
+            self._collect_items(sale_ids[start:start + STREAM_CHUNK_SIZE], items_by_sale)
+        
+        payment_methods = dict(Sale._meta.get_field('payment_method').choices)
+        sales_data = []
+        for row in sale_rows:
+            items_data = items_by_sale.get(row['id'], [])
+            customer_name = None
+            if row['customer_id']:
+                customer_name = f"{row['customer__first_name']} {row['customer__last_name']}"
+            sales_data.append({
+                'id': row['id'],
+                'customer': row['customer_id'],
+                'customer_name': customer_name,
+                'sale_date': row['sale_date'].isoformat() if row['sale_date'] else None,
+                'total_amount': str(_safe_decimal(row['total_amount_raw']).quantize(Decimal('0.01'))),
+                'payment_method': row['payment_method'],
+                'payment_method_display': str(payment_methods.get(row['payment_method'], row['payment_method'])),
+                'notes': row['notes'] or '',
+                'items': items_data,
+                'items_count': len(items_data),
+                'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+            })
+        return sales_data
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
@@ -183,12 +205,19 @@ class SaleViewSet(viewsets.ModelViewSet):
         """Restaure les stocks avant de supprimer la vente"""
         from django.db import transaction
         
+        from products.ledger import apply_stock_deltas
+        from .serializers import _sale_reference
+        
         with transaction.atomic():
-            # Restaurer les stocks pour chaque item
-            for item in instance.items.all():
-                product = item.product
-                product.stock += item.quantity
-                product.save(update_fields=['stock'])
+            # Restaurer les stocks (items lus en une requête, regroupés par produit)
+            items = list(instance.items.order_by().values_list('product_id', 'quantity', 'unit_price'))
+            restored = {}
+            for product_id, quantity, _ in items:
+                restored[product_id] = restored.get(product_id, 0) + quantity
+            apply_stock_deltas(restored, 'sale_delete', _sale_reference(instance), self.request.user)
+            
+            # Retirer la vente des cumuls journaliers
+            rollups.record_sale(instance, items, sign=-1)
             
             # Supprimer les enregistrements de ventes hors stock associés
             OutOfStockSale.objects.filter(sale=instance).delete()
@@ -197,110 +226,62 @@ class SaleViewSet(viewsets.ModelViewSet):
             instance.delete()
     
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Enregistre un lot de ventes en une requête (synchronisation des caisses hors ligne)"""
+        def handler():
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            results = serializer.save(created_by=request.user)
+            return Response({'results': results}, status=status.HTTP_201_CREATED)
+        
+        return self.run_idempotent(request, handler)
+
     @action(detail=False, methods=['get'])
     def export_report(self, request):
-        """Génère un rapport Excel des ventes pour une période donnée"""
-        date_from = request.query_params.get('date_from', None)
-        date_to = request.query_params.get('date_to', None)
-
-        queryset = Sale.objects.all()
-        if date_from:
-            queryset = queryset.filter(sale_date__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(sale_date__date__lte=date_to)
-
-        queryset = queryset.order_by('sale_date')
-
-        # Créer un workbook Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Rapport des Ventes"
-
-        # En-têtes
-        headers = ['Date', 'Heure', 'ID Vente', 'Produit', 'Quantité', 'Prix Unitaire', 'Total', 'Méthode de Paiement']
-        ws.append(headers)
-
-        # Style des en-têtes
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        # Données
-        total_general = 0
-        for sale in queryset:
-            sale_date = sale.sale_date.date()
-            sale_time = sale.sale_date.time()
-            for item in sale.items.all():
-                row = [
-                    sale_date.strftime('%d/%m/%Y'),
-                    sale_time.strftime('%H:%M'),
-                    sale.id,
-                    item.product.name,
-                    item.quantity,
-                    float(item.unit_price),
-                    float(item.subtotal),
-                    sale.get_payment_method_display()
-                ]
-                ws.append(row)
-                total_general += float(item.subtotal)
-
-        # Ajouter le total
-        ws.append([])
-        ws.append(['TOTAL GÉNÉRAL', '', '', '', '', '', total_general, ''])
-
-        # Style du total
-        total_row = ws[ws.max_row]
-        for cell in total_row:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-
-        # Ajuster la largeur des colonnes
-        column_widths = [12, 10, 10, 30, 10, 12, 12, 15]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[chr(64 + i)].width = width
-
-        # Sauvegarder dans un buffer
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-
-        # Créer la réponse HTTP
-        filename = f"rapport_ventes_{date_from or 'all'}_{date_to or 'all'}.xlsx"
-        response = HttpResponse(
-            buffer.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        """Génère un rapport Excel des ventes pour une période donnée (CSV avec ?format=csv)"""
+        return sales_report(request.query_params).response(request)
 
     @action(detail=False, methods=['post'])
     def check_stock(self, request):
-        """Vérifie les stocks avant l'enregistrement d'une vente"""
+        """
+        Vérifie les stocks avant l'enregistrement d'une vente.
+        Avec `reserve: true`, les quantités vérifiées sont réservées pendant
+        STOCK_RESERVATION_TTL ; le jeton renvoyé est à transmettre à la création de la vente.
+        """
+        import uuid
+        from django.conf import settings
+        from django.db import transaction
+        from django.utils import timezone
+        from products.models import Product
+        from .models import StockReservation
+        from .serializers import held_quantities
+        
         items = request.data.get('items', [])
-        stock_issues = []
+        reserve = str(request.data.get('reserve', '')).lower() in ('1', 'true', 'yes')
+        token = request.data.get('reservation') or None
         
+        lines = []
         for item in items:
             product_id = item.get('product')
-            quantity = item.get('quantity', 0)
-            
+            try:
+                quantity = int(item.get('quantity', 0) or 0)
+            except (ValueError, TypeError):
+                quantity = 0
             if not product_id or not quantity:
                 continue
-                
-            from products.models import Product
-            try:
-                product = Product.objects.get(id=product_id)
-                if product.stock < quantity:
-                    stock_issues.append({
-                        'product_id': product_id,
-                        'product_name': product.name,
-                        'requested': quantity,
-                        'available': product.stock,
-                        'shortage': quantity - product.stock
-                    })
-            except Product.DoesNotExist:
+            lines.append((product_id, _as_int(product_id), quantity))
+        
+        # Résoudre tout le panier en une requête, et les réservations des autres en une autre
+        products = Product.objects.only('id', 'name', 'stock').in_bulk(
+            {pk for _, pk, _ in lines if pk is not None}
+        )
+        held = held_quantities(products.keys(), exclude_token=token, user=request.user) if products else {}
+        
+        stock_issues = []
+        for product_id, pk, quantity in lines:
+            product = products.get(pk)
+            if product is None:
                 stock_issues.append({
                     'product_id': product_id,
                     'product_name': 'Produit introuvable',
@@ -308,11 +289,50 @@ class SaleViewSet(viewsets.ModelViewSet):
                     'available': 0,
                     'shortage': quantity
                 })
+                continue
+            available = max(product.stock - held.get(product.id, 0), 0)
+            if available < quantity:
+                stock_issues.append({
+                    'product_id': product_id,
+                    'product_name': product.name,
+                    'requested': quantity,
+                    'available': available,
+                    'shortage': quantity - available
+                })
         
-        return Response({
+        data = {
             'has_issues': len(stock_issues) > 0,
             'issues': stock_issues
-        })
+        }
+        
+        if reserve:
+            now = timezone.now()
+            expires_at = now + getattr(settings, 'STOCK_RESERVATION_TTL', timedelta(minutes=5))
+            token = token or uuid.uuid4().hex
+            requested = {}
+            for _, pk, quantity in lines:
+                if pk in products and quantity > 0:
+                    requested[pk] = requested.get(pk, 0) + quantity
+            # Ne réserver que ce qui est disponible : stock moins les réservations des autres
+            requested = {
+                pk: min(quantity, products[pk].stock - held.get(pk, 0))
+                for pk, quantity in requested.items()
+            }
+            requested = {pk: quantity for pk, quantity in requested.items() if quantity > 0}
+            with transaction.atomic():
+                # Purger en masse les réservations expirées et remplacer celles de ce panier
+                StockReservation.objects.filter(expires_at__lte=now).delete()
+                StockReservation.objects.filter(token=token, created_by=request.user).delete()
+                StockReservation.objects.bulk_create([
+                    StockReservation(
+                        token=token, product_id=product_id, quantity=quantity,
+                        created_by=request.user, expires_at=expires_at
+                    )
+                    for product_id, quantity in requested.items()
+                ])
+            data['reservation'] = {'token': token, 'expires_at': expires_at.isoformat()}
+        
+        return Response(data)
 
 
 class OutOfStockSaleListView(generics.ListAPIView):
@@ -325,3 +345,100 @@ class OutOfStockSaleListView(generics.ListAPIView):
         queryset = OutOfStockSale.objects.all().order_by('-created_at')
         return queryset
 
+
+
+def _analytics_dates(params):
+    """Lit date_from / date_to ; retourne (dates, réponse d'erreur ou None)"""
+    from django.utils.dateparse import parse_date
+    
+    dates = {}
+    for name in ('date_from', 'date_to'):
+        value = params.get(name)
+        if value:
+            dates[name] = parse_date(value)
+            if dates[name] is None:
+                return dates, Response(
+                    {'error': f'Date invalide pour {name} (format attendu : AAAA-MM-JJ)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+    return dates, None
+
+
+class SalesAnalyticsView(APIView):
+    """
+    Statistiques de ventes groupées :
+    ?period=day|week|month, ?dimension=product|category|customer|payment_method|cashier,
+    ?date_from=AAAA-MM-JJ, ?date_to=AAAA-MM-JJ (toutes optionnelles).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .analytics import DIMENSIONS, PERIODS, sales_analytics
+
+        params = request.query_params
+        period = params.get('period') or None
+        dimension = params.get('dimension') or None
+        if period is not None and period not in PERIODS:
+            return Response(
+                {'error': f"Période invalide. Valeurs possibles : {', '.join(PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if dimension is not None and dimension not in DIMENSIONS:
+            return Response(
+                {'error': f"Dimension invalide. Valeurs possibles : {', '.join(DIMENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates, error = _analytics_dates(params)
+        if error:
+            return error
+
+        return Response({
+            'period': period,
+            'dimension': dimension,
+            'date_from': params.get('date_from'),
+            'date_to': params.get('date_to'),
+            'results': sales_analytics(period, dimension, **dates),
+        })
+
+
+class ProductABCView(APIView):
+    """
+    Classement ABC des produits sur une période :
+    ?date_from=AAAA-MM-JJ, ?date_to=AAAA-MM-JJ, ?metric=revenue|units,
+    ?a=80 et ?b=95 (seuils de part cumulée en %).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .analytics import ABC_METRICS, abc_analysis
+
+        params = request.query_params
+        metric = params.get('metric') or 'revenue'
+        if metric not in ABC_METRICS:
+            return Response(
+                {'error': f"Critère invalide. Valeurs possibles : {', '.join(ABC_METRICS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            a_share = float(params.get('a', 80))
+            b_share = float(params.get('b', 95))
+        except ValueError:
+            return Response({'error': 'Les seuils a et b doivent être des nombres'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < a_share <= b_share <= 100:
+            return Response(
+                {'error': 'Les seuils doivent vérifier 0 < a <= b <= 100'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dates, error = _analytics_dates(params)
+        if error:
+            return error
+
+        return Response({
+            'metric': metric,
+            'date_from': params.get('date_from'),
+            'date_to': params.get('date_to'),
+            'thresholds': {'a': a_share, 'b': b_share},
+            'results': abc_analysis(metric=metric, a_share=a_share, b_share=b_share, **dates),
+        })